@@ -2,17 +2,16 @@ import os
 import tkinter as tk
 from tkinter import messagebox, ttk, filedialog, scrolledtext
 import threading
-import requests
-from PIL import Image, ImageTk
-from io import BytesIO
+import multiprocessing
 import webbrowser
 import queue
 import shutil
-
-try:
-    from yt_dlp import YoutubeDL
-except ImportError:
-    YoutubeDL = None
+import logging
+import hashlib
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from caa_engine import APP_DATA_DIR, DEFAULT_DOWNLOAD_DIR, COLLECTION_URL_RE, QUALITY_PRESETS, LOG_LEVELS, SEGMENT_CONNECTIONS, POSTPROCESS_WORKERS, InfoCache, DownloadItem, DownloadSettings, DownloadEngine, parse_url_list, yt_dlp_available
 
 # --- Configuration & Assets ---
 APP_NAME = "CAA Downloader"
@@ -25,30 +24,113 @@ TEXT_COLOR_NORMAL = "#a0aec0"
 TEXT_COLOR_BRIGHT = "#ffffff"
 FONT_FAMILY = "Segoe UI"
 PLACEHOLDER_TEXT = "Paste video link here..."
+THUMB_CACHE_DIR = os.path.join(APP_DATA_DIR, "thumbnails")
+THUMB_SIZE = (160, 90)
+THUMB_CACHE_MAX_BYTES = 32 * 1024 * 1024
+THUMB_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+PROGRESS_FPS = 10
+ROW_HEIGHT = 150
+CARD_MIN_WIDTH = 420
+CARD_PAD = 10
+LOG_MAX_LINES = 5000
+LOG_BATCH_SIZE = 1000
+
+class ThumbnailService:
+    def __init__(self, directory=THUMB_CACHE_DIR, size=THUMB_SIZE, workers=4, memory_items=256, max_bytes=THUMB_CACHE_MAX_BYTES, max_age=THUMB_CACHE_MAX_AGE):
+        self.directory, self.size, self.memory_items, self.max_bytes, self.max_age = directory, size, memory_items, max_bytes, max_age
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self.workers = workers; self.session = None; self.lock = threading.Lock(); self.memory = OrderedDict(); self.waiters = {}; self.results = queue.Queue(); self.executor.submit(self._prune)
+
+    def _session(self):
+        with self.lock:
+            if self.session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                self.session = requests.Session(); adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers); self.session.mount("http://", adapter); self.session.mount("https://", adapter)
+            return self.session
+
+    def _prune(self):
+        try: entries = sorted((e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(self.directory) if e.name.endswith(".jpg"))
+        except OSError: return
+        total = sum(size for _, size, _ in entries); cutoff = time.time() - self.max_age
+        for mtime, size, path in entries:
+            if total <= self.max_bytes and mtime >= cutoff: break
+            try: os.remove(path); total -= size
+            except OSError: pass
+
+    def request(self, key, url, callback):
+        with self.lock:
+            image = self.memory.get(key)
+            if image is None:
+                if key in self.waiters: self.waiters[key].append(callback)
+                else: self.waiters[key] = [callback]; self.executor.submit(self._load, key, url)
+                return
+            self.memory.move_to_end(key)
+        callback(image)
+
+    def _load(self, key, url):
+        path = os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".jpg"); image = None
+        try:
+            from io import BytesIO
+            from PIL import Image
+            if os.path.exists(path): image = Image.open(path); image.load(); os.utime(path)
+            else:
+                response = self._session().get(url, timeout=10); response.raise_for_status()
+                image = Image.open(BytesIO(response.content)); image.draft("RGB", (self.size[0] * 2, self.size[1] * 2)); image = image.convert("RGB"); image.thumbnail(self.size, Image.Resampling.LANCZOS)
+                os.makedirs(self.directory, exist_ok=True); image.save(path + ".tmp", "JPEG", quality=90); os.replace(path + ".tmp", path)
+        except Exception: image = None
+        self.results.put((key, image))
+
+    def deliver(self):
+        batch = []
+        try:
+            while True: batch.append(self.results.get_nowait())
+        except queue.Empty: pass
+        for key, image in batch:
+            with self.lock:
+                callbacks = self.waiters.pop(key, [])
+                if image is not None:
+                    self.memory[key] = image
+                    if len(self.memory) > self.memory_items: self.memory.popitem(last=False)
+            for callback in callbacks: callback(image)
+
+class QueueItem(DownloadItem):
+    def __init__(self, info, url, format_id, progress):
+        super().__init__(info, url, format_id, progress); self.percent = 0.0; self.pause_text, self.pause_state, self.cancel_text = "Pause", "normal", "Cancel"; self.set_status("Status: Queued")
 
-class CustomError(Exception): pass
+    def set_status(self, text, color=PRIMARY_COLOR): self.status_text, self.status_color, self.speed_text = text, color, ""
+
+    def apply_progress(self, status, percent, speed, eta):
+        if status == 'finished': self.set_status(*(("Processing...",) if self.state == "processing" else ("Completed!", "#4ade80"))); self.percent, self.pause_state, self.cancel_text = 100, "disabled", "Remove"; return
+        if percent is not None: self.percent = round(percent, 1); self.status_text = f"Downloading... {self.percent:.1f}%"
+        self.speed_text = f"{speed / 1024 / 1024:.2f} MiB/s" if speed else ""
+        if speed and eta is not None: self.speed_text += f" · ETA {int(eta) // 60}:{int(eta) % 60:02d}"
 
 class LogViewer(tk.Toplevel):
-    def __init__(self, master):
-        super().__init__(master, bg=CONTENT_COLOR); self.title("Log Viewer"); self.geometry("800x400")
+    def __init__(self, master, on_level_change=None, max_lines=LOG_MAX_LINES):
+        super().__init__(master, bg=CONTENT_COLOR); self.title("Log Viewer"); self.geometry("800x400"); self.max_lines = max_lines; self.buffer = deque(maxlen=max_lines); self.level = logging.INFO
+        toolbar = tk.Frame(self, bg=CONTENT_COLOR); toolbar.pack(fill="x", padx=5, pady=5); tk.Label(toolbar, text="Level:", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 9)).pack(side="left")
+        self.level_combo = ttk.Combobox(toolbar, state="readonly", values=list(LOG_LEVELS), width=10); self.level_combo.set("INFO"); self.level_combo.pack(side="left", padx=5); self.level_combo.bind("<<ComboboxSelected>>", lambda e: on_level_change and on_level_change(self.level_combo.get()))
         self.log_area = scrolledtext.ScrolledText(self, state='disabled', bg=BG_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 9))
         self.log_area.pack(expand=True, fill='both'); self.protocol("WM_DELETE_WINDOW", self.withdraw)
 
-    def log(self, message):
-        if not self.winfo_exists(): return
-        self.log_area.configure(state='normal'); self.log_area.insert(tk.END, message); self.log_area.configure(state='disabled'); self.log_area.see(tk.END)
+    def log_batch(self, entries):
+        self.buffer.extend(entries)
+        if self.state() != "normal": return
+        text = "".join(message for level, message in entries if level >= self.level)
+        if not text: return
+        self.log_area.configure(state='normal'); self.log_area.insert(tk.END, text)
+        lines = int(self.log_area.index('end-1c').split('.')[0])
+        if lines > self.max_lines: self.log_area.delete('1.0', f"{lines - self.max_lines + 1}.0")
+        self.log_area.configure(state='disabled'); self.log_area.see(tk.END)
 
-class MyLogger:
-    def __init__(self, log_queue): self.log_queue = log_queue
-    def debug(self, msg):
-        if msg.startswith('[debug] '): self.log_queue.put(f"DEBUG: {msg}\n")
-    def info(self, msg): self.log_queue.put(f"INFO: {msg}\n")
-    def warning(self, msg): self.log_queue.put(f"WARNING: {msg}\n")
-    def error(self, msg): self.log_queue.put(f"ERROR: {msg}\n")
+    def render(self):
+        self.log_area.configure(state='normal'); self.log_area.delete('1.0', tk.END); self.log_area.insert(tk.END, "".join(message for level, message in self.buffer if level >= self.level)); self.log_area.configure(state='disabled'); self.log_area.see(tk.END)
+    def show(self): self.deiconify(); self.render()
 
 class SettingsWindow(tk.Toplevel):
     def __init__(self, master, app_instance):
-        super().__init__(master, bg=CONTENT_COLOR); self.transient(master); self.title("Settings"); self.geometry("550x520"); self.resizable(False, False); self.app = app_instance
+        super().__init__(master, bg=CONTENT_COLOR); self.transient(master); self.title("Settings"); self.geometry("550x660"); self.resizable(False, False); self.app = app_instance
         tk.Label(self, text="Application Settings", bg=CONTENT_COLOR, fg=TEXT_COLOR_BRIGHT, font=(FONT_FAMILY, 14, "bold")).pack(pady=(15, 20))
         path_frame = tk.Frame(self, bg=CONTENT_COLOR); path_frame.pack(fill="x", padx=20, pady=5); tk.Label(path_frame, text="Download Path:", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 10)).pack(side="left"); self.path_entry = tk.Entry(path_frame, textvariable=self.app.download_path_var, font=(FONT_FAMILY, 9), bg=CARD_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat"); self.path_entry.pack(side="left", fill="x", expand=True, padx=10); browse_btn = tk.Button(path_frame, text="Browse", command=self.browse_directory, bg=SIDEBAR_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat"); browse_btn.pack(side="left")
         network_frame = tk.LabelFrame(self, text="Network Settings", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, padx=10, pady=10, font=(FONT_FAMILY, 10)); network_frame.pack(fill="x", padx=20, pady=10)
@@ -56,15 +138,23 @@ class SettingsWindow(tk.Toplevel):
         ipv4_check = tk.Checkbutton(network_frame, text="Force IPv4 for connections", variable=self.app.force_ipv4_var, bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, selectcolor=BG_COLOR, activebackground=CONTENT_COLOR, activeforeground=TEXT_COLOR_NORMAL); ipv4_check.pack(anchor='w', pady=(5,0))
         proxy_method_frame = tk.Frame(network_frame, bg=CONTENT_COLOR); proxy_method_frame.pack(fill='x', pady=(10, 5), anchor='w'); tk.Label(proxy_method_frame, text="Proxy Method:", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL).pack(side="left", padx=(0, 10)); tk.Radiobutton(proxy_method_frame, text="None", variable=self.app.proxy_method_var, value="none", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, selectcolor=BG_COLOR, activebackground=CONTENT_COLOR, command=self.toggle_manual_proxy_entry).pack(side="left"); tk.Radiobutton(proxy_method_frame, text="System", variable=self.app.proxy_method_var, value="system", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, selectcolor=BG_COLOR, activebackground=CONTENT_COLOR, command=self.toggle_manual_proxy_entry).pack(side="left", padx=5); tk.Radiobutton(proxy_method_frame, text="Manual", variable=self.app.proxy_method_var, value="manual", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, selectcolor=BG_COLOR, activebackground=CONTENT_COLOR, command=self.toggle_manual_proxy_entry).pack(side="left")
         self.manual_proxy_frame = tk.Frame(network_frame, bg=CONTENT_COLOR); self.manual_proxy_frame.pack(fill='x', pady=5); self.manual_proxy_label = tk.Label(self.manual_proxy_frame, text="Manual Proxy Address:", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL); self.manual_proxy_label.pack(side="left", padx=(20,0)); self.proxy_entry = tk.Entry(self.manual_proxy_frame, textvariable=self.app.proxy_address_var, font=(FONT_FAMILY, 9), bg=CARD_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat"); self.proxy_entry.pack(side="left", fill="x", expand=True, padx=10)
+        queue_frame = tk.LabelFrame(self, text="Download Queue", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, padx=10, pady=10, font=(FONT_FAMILY, 10)); queue_frame.pack(fill="x", padx=20, pady=(0, 10))
+        limits_row = tk.Frame(queue_frame, bg=CONTENT_COLOR); limits_row.pack(fill='x'); post_row = tk.Frame(queue_frame, bg=CONTENT_COLOR); post_row.pack(fill='x', pady=(5, 0))
+        tk.Label(limits_row, text="Simultaneous downloads:", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL).pack(side="left"); tk.Entry(limits_row, textvariable=self.app.max_concurrent_var, font=(FONT_FAMILY, 9), width=5, bg=CARD_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat").pack(side="left", padx=5)
+        tk.Label(limits_row, text="Per site:", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL).pack(side="left", padx=(15, 0)); tk.Entry(limits_row, textvariable=self.app.max_per_host_var, font=(FONT_FAMILY, 9), width=5, bg=CARD_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat").pack(side="left", padx=5)
+        tk.Label(limits_row, text="Connections:", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL).pack(side="left", padx=(15, 0)); tk.Entry(limits_row, textvariable=self.app.connections_var, font=(FONT_FAMILY, 9), width=5, bg=CARD_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat").pack(side="left", padx=5)
+        tk.Label(post_row, text="Post-processing workers:", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL).pack(side="left"); tk.Entry(post_row, textvariable=self.app.postprocess_workers_var, font=(FONT_FAMILY, 9), width=5, bg=CARD_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat").pack(side="left", padx=5)
+        tk.Checkbutton(post_row, text="Skip already downloaded", variable=self.app.skip_archived_var, bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, selectcolor=BG_COLOR, activebackground=CONTENT_COLOR, activeforeground=TEXT_COLOR_NORMAL).pack(side="left", padx=(15, 0))
         cookie_main_frame = tk.LabelFrame(self, text="Cookie Settings", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, padx=10, pady=10, font=(FONT_FAMILY, 10)); cookie_main_frame.pack(fill="x", padx=20, pady=10); self.cookie_check = tk.Checkbutton(cookie_main_frame, text="Use Cookies", variable=self.app.use_cookies_var, bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, selectcolor=BG_COLOR, activebackground=CONTENT_COLOR, command=self.toggle_cookie_widgets); self.cookie_check.pack(anchor="w"); self.radio_frame = tk.Frame(cookie_main_frame, bg=CONTENT_COLOR); self.radio_frame.pack(fill="x", pady=(5,0)); tk.Radiobutton(self.radio_frame, text="From File", variable=self.app.cookie_source_var, value="file", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, selectcolor=BG_COLOR, activebackground=CONTENT_COLOR, command=self.toggle_cookie_source_widgets).pack(side="left"); tk.Radiobutton(self.radio_frame, text="From Browser (Recommended)", variable=self.app.cookie_source_var, value="browser", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, selectcolor=BG_COLOR, activebackground=CONTENT_COLOR, command=self.toggle_cookie_source_widgets).pack(side="left", padx=10)
         tk.Label(cookie_main_frame, text="Note: For browser cookies, fully close your browser first for best results.", font=(FONT_FAMILY, 8, "italic"), bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL).pack(anchor='w', pady=5)
         self.file_cookie_frame = tk.Frame(cookie_main_frame, bg=CONTENT_COLOR); self.file_cookie_frame.pack(fill="x", pady=5); self.cookie_file_entry = tk.Entry(self.file_cookie_frame, textvariable=self.app.cookie_path_var, font=(FONT_FAMILY, 9), bg=CARD_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat"); self.cookie_file_entry.pack(side="left", fill="x", expand=True); browse_cookie_btn = tk.Button(self.file_cookie_frame, text="Browse File", command=self.browse_cookie_file, bg=SIDEBAR_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat"); browse_cookie_btn.pack(side="left", padx=(5,0))
         self.browser_cookie_frame = tk.Frame(cookie_main_frame, bg=CONTENT_COLOR); self.browser_cookie_frame.pack(fill="x", pady=5); tk.Label(self.browser_cookie_frame, text="Browser:", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL).pack(side="left"); self.browser_combo = ttk.Combobox(self.browser_cookie_frame, textvariable=self.app.browser_cookie_var, state="readonly", values=["chrome", "firefox", "edge", "opera", "vivaldi", "brave"]); self.browser_combo.pack(side="left", padx=10)
         self.browser_profile_frame = tk.Frame(cookie_main_frame, bg=CONTENT_COLOR); self.browser_profile_frame.pack(fill="x", pady=5); tk.Label(self.browser_profile_frame, text="Profile (Optional):", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL).pack(side="left"); self.browser_profile_entry = tk.Entry(self.browser_profile_frame, textvariable=self.app.browser_profile_var, font=(FONT_FAMILY, 9), bg=CARD_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat"); self.browser_profile_entry.pack(side="left", fill="x", expand=True, padx=5)
         self.toggle_manual_proxy_entry(); self.toggle_cookie_widgets()
-        save_btn = tk.Button(self, text="Save & Close", command=self.destroy, bg=PRIMARY_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat", font=(FONT_FAMILY, 10, "bold"), padx=15, pady=8); save_btn.pack(side="bottom", pady=20)
-        self.grab_set()
+        save_btn = tk.Button(self, text="Save & Close", command=self.save_and_close, bg=PRIMARY_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat", font=(FONT_FAMILY, 10, "bold"), padx=15, pady=8); save_btn.pack(side="bottom", pady=20)
+        self.protocol("WM_DELETE_WINDOW", self.save_and_close); self.grab_set()
 
+    def save_and_close(self): self.app.sync_settings(); self.destroy()
     def toggle_manual_proxy_entry(self): state = "normal" if self.app.proxy_method_var.get() == "manual" else "disabled"; self.manual_proxy_label.config(state=state); self.proxy_entry.config(state=state)
     def toggle_cookie_widgets(self): state = "normal" if self.app.use_cookies_var.get() else "disabled"; [w.config(state=state) for w in self.radio_frame.winfo_children()]; self.toggle_cookie_source_widgets()
     def toggle_cookie_source_widgets(self):
@@ -74,21 +164,21 @@ class SettingsWindow(tk.Toplevel):
     def browse_directory(self): path = filedialog.askdirectory(initialdir=self.app.download_path_var.get());_ = path and self.app.download_path_var.set(path)
     def browse_cookie_file(self): path = filedialog.askopenfilename(title="Select Cookie File", filetypes=[("Text files", "*.txt"), ("All files", "*.*")]); _ = path and self.app.cookie_path_var.set(path)
 
+def add_quality_options(parent, variable, ffmpeg_installed):
+    for text, format_id in QUALITY_PRESETS.items():
+        rb = tk.Radiobutton(parent, text=text, variable=variable, value=format_id, bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, selectcolor=BG_COLOR, activebackground=CONTENT_COLOR)
+        rb.pack(anchor='w', padx=20)
+        if "bestvideo" in format_id and not ffmpeg_installed:
+            rb.config(state="disabled")
+
+    variable.set(QUALITY_PRESETS["Audio Only (MP3)"] if not ffmpeg_installed else QUALITY_PRESETS["Best Available"])
+
 class QualitySelectionWindow(tk.Toplevel):
     def __init__(self, master, app_instance, info):
         super().__init__(master, bg=CONTENT_COLOR); self.transient(master); self.title("Select Quality"); self.geometry("450x300"); self.resizable(False, False); self.app, self.info = app_instance, info
         tk.Label(self, text="Select Download Quality", bg=CONTENT_COLOR, fg=TEXT_COLOR_BRIGHT, font=(FONT_FAMILY, 12, "bold")).pack(pady=10)
         tk.Label(self, text=info.get('title', '')[:50], bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 9)).pack(pady=(0, 10))
-        self.format_id_var = tk.StringVar()
-        qualities = {"Best Available": "bestvideo*+bestaudio/best", "1080p": "bestvideo[height<=1080]+bestaudio/best", "720p": "bestvideo[height<=720]+bestaudio/best", "Audio Only (MP3)": "bestaudio/best"}
-        
-        for text, format_id in qualities.items():
-            rb = tk.Radiobutton(self, text=text, variable=self.format_id_var, value=format_id, bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, selectcolor=BG_COLOR, activebackground=CONTENT_COLOR)
-            rb.pack(anchor='w', padx=20)
-            if "bestvideo" in format_id and not self.app.ffmpeg_installed:
-                rb.config(state="disabled")
-
-        self.format_id_var.set(qualities["Audio Only (MP3)"] if not self.app.ffmpeg_installed else qualities["Best Available"])
+        self.format_id_var = tk.StringVar(); add_quality_options(self, self.format_id_var, self.app.ffmpeg_installed)
         
         start_btn = tk.Button(self, text="Start Download", command=self.start_download, bg=PRIMARY_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat", font=(FONT_FAMILY, 10, "bold"), padx=15, pady=8); start_btn.pack(side="bottom", pady=20)
         self.grab_set()
@@ -99,63 +189,117 @@ class QualitySelectionWindow(tk.Toplevel):
         self.app._create_download_task(self.info['original_url'], format_id, self.info)
         self.destroy()
 
+class BatchWindow(tk.Toplevel):
+    def __init__(self, master, app_instance, text=""):
+        super().__init__(master, bg=CONTENT_COLOR); self.transient(master); self.title("Batch Download"); self.geometry("550x520"); self.resizable(False, False); self.app = app_instance
+        tk.Label(self, text="Playlists, Channels & Link Lists", bg=CONTENT_COLOR, fg=TEXT_COLOR_BRIGHT, font=(FONT_FAMILY, 12, "bold")).pack(pady=10)
+        tk.Label(self, text="One link per line. Playlist and channel links are expanded automatically.", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 9)).pack()
+        self.url_text = scrolledtext.ScrolledText(self, height=10, bg=CARD_COLOR, fg=TEXT_COLOR_BRIGHT, insertbackground=PRIMARY_COLOR, relief="flat", font=(FONT_FAMILY, 9)); self.url_text.pack(fill="x", padx=20, pady=10); self.url_text.insert("1.0", text)
+        load_btn = tk.Button(self, text="Load From File...", command=self.load_file, bg=SIDEBAR_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat"); load_btn.pack(anchor="w", padx=20, pady=(0, 10))
+        tk.Label(self, text="Quality for all items:", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 10)).pack(anchor="w", padx=20)
+        self.format_id_var = tk.StringVar(); add_quality_options(self, self.format_id_var, self.app.ffmpeg_installed)
+        start_btn = tk.Button(self, text="Queue All", command=self.start_batch, bg=PRIMARY_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat", font=(FONT_FAMILY, 10, "bold"), padx=15, pady=8); start_btn.pack(side="bottom", pady=20)
+        self.grab_set()
+
+    def load_file(self):
+        path = filedialog.askopenfilename(title="Select Link List", filetypes=[("Text files", "*.txt"), ("All files", "*.*")], parent=self)
+        if not path: return
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f: self.url_text.insert(tk.END, "\n" + f.read())
+        except OSError as e: messagebox.showerror("Error", f"Could not read file:\n{e}", parent=self)
+
+    def start_batch(self):
+        sources = parse_url_list(self.url_text.get("1.0", tk.END))
+        if not sources: messagebox.showerror("Error", "Please enter at least one link.", parent=self); return
+        if self.app.start_batch(sources, self.format_id_var.get()): self.destroy()
+
 class DownloadCard(tk.Frame):
-    def __init__(self, parent, info, url, format_id, app):
-        super().__init__(parent, bg=CARD_COLOR); self.info, self.url, self.format_id, self.app = info, url, format_id, app
-        self.state = "queued"; self.download_thread = None
-        self.thumb_label = tk.Label(self, bg=BG_COLOR, width=20, height=9, text="🖼️", fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 20)); self.thumb_label.pack(side="left", padx=15, pady=15)
+    def __init__(self, parent, app, placeholder):
+        super().__init__(parent, bg=CARD_COLOR); self.app, self.placeholder = app, placeholder; self.item = None; self.rendered = {}; self.window_id = None; self.position = None
+        self.thumb_label = tk.Label(self, bg=BG_COLOR, image=placeholder, compound="center", text="🖼️", fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 20)); self.thumb_label.pack(side="left", padx=15, pady=15)
         main_info_frame = tk.Frame(self, bg=self['bg']); main_info_frame.pack(side="left", fill="both", expand=True, padx=(0, 15))
-        self.title_label = tk.Label(main_info_frame, text=info.get('title', 'Unknown')[:45], bg=self['bg'], fg=TEXT_COLOR_BRIGHT, font=(FONT_FAMILY, 11, "bold"), anchor="w", justify="left"); self.title_label.pack(fill="x", pady=(10, 2))
-        self.channel_label = tk.Label(main_info_frame, text=f"Uploader: {info.get('uploader', 'N/A')}", bg=self['bg'], fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 9), anchor="w"); self.channel_label.pack(fill="x")
+        self.title_label = tk.Label(main_info_frame, text="", bg=self['bg'], fg=TEXT_COLOR_BRIGHT, font=(FONT_FAMILY, 11, "bold"), anchor="w", justify="left"); self.title_label.pack(fill="x", pady=(10, 2))
+        self.channel_label = tk.Label(main_info_frame, text="", bg=self['bg'], fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 9), anchor="w"); self.channel_label.pack(fill="x")
         status_frame = tk.Frame(main_info_frame, bg=self['bg']); status_frame.pack(fill='x', pady=2)
-        self.status_label = tk.Label(status_frame, text="Status: Queued", bg=self['bg'], fg=PRIMARY_COLOR, font=(FONT_FAMILY, 9, "italic"), anchor="w"); self.status_label.pack(side="left")
+        self.status_label = tk.Label(status_frame, text="", bg=self['bg'], fg=PRIMARY_COLOR, font=(FONT_FAMILY, 9, "italic"), anchor="w"); self.status_label.pack(side="left")
         self.speed_label = tk.Label(status_frame, text="", bg=self['bg'], fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 9), anchor="e"); self.speed_label.pack(side="right")
         self.progress_var = tk.DoubleVar(); self.progress_bar = ttk.Progressbar(main_info_frame, variable=self.progress_var, maximum=100, style="TProgressbar"); self.progress_bar.pack(fill="x", pady=(0, 5))
         controls_frame = tk.Frame(main_info_frame, bg=self['bg']); controls_frame.pack(fill='x', pady=(0,5))
-        self.pause_resume_button = tk.Button(controls_frame, text="Pause", command=self.toggle_pause_resume, bg="#4a5568", fg=TEXT_COLOR_BRIGHT, relief="flat", font=(FONT_FAMILY, 8, "bold"), width=10); self.pause_resume_button.pack(side="right")
-        self.cancel_button = tk.Button(controls_frame, text="Cancel", command=self.cancel_download, bg="#c94444", fg=TEXT_COLOR_BRIGHT, relief="flat", font=(FONT_FAMILY, 8, "bold"), width=10); self.cancel_button.pack(side="right", padx=5)
-        self.load_thumbnail(info.get('thumbnail'))
+        self.pause_resume_button = tk.Button(controls_frame, text="Pause", command=lambda: self.item and self.app.toggle_pause_resume(self.item), bg="#4a5568", fg=TEXT_COLOR_BRIGHT, relief="flat", font=(FONT_FAMILY, 8, "bold"), width=10); self.pause_resume_button.pack(side="right")
+        self.cancel_button = tk.Button(controls_frame, text="Cancel", command=lambda: self.item and self.app.cancel_download(self.item), bg="#c94444", fg=TEXT_COLOR_BRIGHT, relief="flat", font=(FONT_FAMILY, 8, "bold"), width=10); self.cancel_button.pack(side="right", padx=5)
+        for text, offset in (("⤒", None), ("▲", -1), ("▼", 1)): tk.Button(controls_frame, text=text, command=lambda o=offset: self.item and self.app.move_item(self.item, o), bg="#2d3748", fg=TEXT_COLOR_BRIGHT, relief="flat", font=(FONT_FAMILY, 8), width=3).pack(side="left", padx=(0, 3))
 
-    def load_thumbnail(self, url):
-        if url: threading.Thread(target=self._load_image_task, args=(url,), daemon=True).start()
-    def _load_image_task(self, url):
-        try:
-            response = requests.get(url, timeout=10)
-            img = Image.open(BytesIO(response.content)); img.thumbnail((160, 90), Image.Resampling.LANCZOS); photo = ImageTk.PhotoImage(img)
-            self.thumb_label.config(image=photo, width=160, height=90, text=""); self.thumb_label.image = photo
-        except Exception: self.thumb_label.config(text="No Preview", font=(FONT_FAMILY, 10))
-    
-    def update_progress(self, d):
-        if self.state in ["pausing", "cancelled"]: raise CustomError("Download Interrupted")
-        if d['status'] == 'downloading':
-            self.state = "downloading"
-            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
-            if total_bytes: percent = (d['downloaded_bytes'] / total_bytes) * 100; self.progress_var.set(percent); self.status_label.config(text=f"Downloading... {percent:.1f}%")
-            speed = d.get('speed'); self.speed_label.config(text=f"{speed / 1024 / 1024:.2f} MiB/s" if speed else "")
-        elif d['status'] == 'finished':
-            self.state = "finished"
-            self.progress_var.set(100); self.status_label.config(text="Completed!", fg="#4ade80"); self.speed_label.config(text="")
-            self.pause_resume_button.config(state="disabled"); self.cancel_button.config(text="Remove", command=self.destroy)
-
-    def toggle_pause_resume(self):
-        if self.state == "downloading": self.state = "pausing"; self.status_label.config(text="Pausing..."); self.pause_resume_button.config(text="Pausing...", state="disabled")
-        elif self.state == "paused": self.state = "resuming"; self.status_label.config(text="Resuming..."); self.pause_resume_button.config(text="Pause", state="normal"); self.app.start_download_thread(self)
-
-    def cancel_download(self): self.state = "cancelled"; self.destroy()
+    def bind_item(self, item):
+        self.item, self.rendered = item, {}
+        self.title_label.config(text=item.info.get('title', 'Unknown')[:45]); self.channel_label.config(text=f"Uploader: {item.info.get('uploader', 'N/A')}")
+        self.thumb_label.config(image=self.placeholder, text="🖼️", font=(FONT_FAMILY, 20)); self.thumb_label.image = None; self.sync()
+        thumbnail = item.info.get('thumbnail')
+        if thumbnail: self.app.thumbnails.request(InfoCache.key_for(item.url), thumbnail, lambda image, item=item: self.item is item and self.show_thumbnail(image))
+
+    def show_thumbnail(self, image):
+        if image is None: self.thumb_label.config(text="No Preview", font=(FONT_FAMILY, 10)); return
+        from PIL import ImageTk
+        photo = ImageTk.PhotoImage(image); self.thumb_label.config(image=photo, text=""); self.thumb_label.image = photo
+
+    def sync(self):
+        item = self.item; values = {'status': (item.status_text, item.status_color), 'percent': item.percent, 'speed': item.speed_text, 'pause': (item.pause_text, item.pause_state), 'cancel': item.cancel_text}
+        changed = {key for key, value in values.items() if self.rendered.get(key) != value}
+        if 'status' in changed: self.status_label.config(text=item.status_text, fg=item.status_color)
+        if 'percent' in changed: self.progress_var.set(item.percent)
+        if 'speed' in changed: self.speed_label.config(text=item.speed_text)
+        if 'pause' in changed: self.pause_resume_button.config(text=item.pause_text, state=item.pause_state)
+        if 'cancel' in changed: self.cancel_button.config(text=item.cancel_text)
+        self.rendered = values
+
+class QueueView(tk.Frame):
+    def __init__(self, parent, app):
+        super().__init__(parent, bg=CONTENT_COLOR); self.app = app; self.cards = {}; self.pool = []; self.columns = 0
+        self.placeholder = tk.PhotoImage(width=THUMB_SIZE[0], height=THUMB_SIZE[1])
+        self.canvas = tk.Canvas(self, bg=CONTENT_COLOR, highlightthickness=0); scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview); self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.pack(side="left", fill="both", expand=True); scrollbar.pack(side="right", fill="y"); self.canvas.bind("<Configure>", self.on_configure)
+
+    def yview(self, *args): self.canvas.yview(*args); self.refresh()
+    def update_item(self, item): card = self.cards.get(item);_ = card and card.sync()
+
+    def on_configure(self, event):
+        columns = max(1, (event.width - 20) // CARD_MIN_WIDTH)
+        if columns != self.columns: self.columns = columns; self.relayout()
+        else: self.refresh()
+
+    def relayout(self):
+        if not self.columns: return
+        rows = -(-len(self.app.items) // self.columns); self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), rows * ROW_HEIGHT)); self.refresh()
+
+    def refresh(self):
+        if not self.columns: return
+        items = self.app.items; top = self.canvas.canvasy(0); width = self.canvas.winfo_width() // self.columns
+        first = int(top // ROW_HEIGHT) * self.columns; last = min(len(items), (int((top + self.canvas.winfo_height()) // ROW_HEIGHT) + 1) * self.columns)
+        visible = items[first:last]; visible_set = set(visible)
+        for item in [item for item in self.cards if item not in visible_set]:
+            card = self.cards.pop(item); card.item = card.position = None; self.canvas.itemconfigure(card.window_id, state="hidden"); self.pool.append(card)
+        for index, item in enumerate(visible, first):
+            card = self.cards.get(item)
+            if card is None: card = self.cards[item] = self.pool.pop() if self.pool else self._new_card(); card.bind_item(item)
+            position = (index % self.columns * width, index // self.columns * ROW_HEIGHT, width)
+            if card.position != position: card.position = position; self.canvas.coords(card.window_id, position[0] + CARD_PAD, position[1] + CARD_PAD); self.canvas.itemconfigure(card.window_id, width=width - 2 * CARD_PAD, state="normal")
+
+    def _new_card(self):
+        card = DownloadCard(self.canvas, self.app, self.placeholder); card.window_id = self.canvas.create_window(0, 0, window=card, anchor="nw", height=ROW_HEIGHT - 2 * CARD_PAD, state="hidden"); return card
 
 class App:
     def __init__(self, root):
         self.root = root; self.root.title(APP_NAME); self.root.geometry("1000x700"); self.root.configure(bg=BG_COLOR); self.root.minsize(900, 600)
         
-        default_folder = os.path.join(os.path.expanduser("~"), "Videos", "CAA Downloader")
-        self.download_path_var = tk.StringVar(value=default_folder)
+        self.download_path_var = tk.StringVar(value=DEFAULT_DOWNLOAD_DIR)
         self.socket_timeout_var = tk.StringVar(value="60"); self.force_ipv4_var = tk.BooleanVar(value=False); self.proxy_method_var = tk.StringVar(value="none"); self.proxy_address_var = tk.StringVar(value="http://127.0.0.1:8080"); self.use_cookies_var = tk.BooleanVar(value=False); self.cookie_source_var = tk.StringVar(value="browser"); self.cookie_path_var = tk.StringVar(); self.browser_cookie_var = tk.StringVar(value="chrome"); self.browser_profile_var = tk.StringVar()
+        self.max_concurrent_var = tk.StringVar(value="3"); self.max_per_host_var = tk.StringVar(value="2"); self.connections_var = tk.StringVar(value=str(SEGMENT_CONNECTIONS)); self.postprocess_workers_var = tk.StringVar(value=str(POSTPROCESS_WORKERS)); self.skip_archived_var = tk.BooleanVar(value=True)
         self.platforms = {'youtube': {'name': 'YouTube', 'icon': '🔴', 'supported': True}, 'aparat': {'name': 'Aparat', 'icon': '🟠', 'supported': False}, 'instagram': {'name': 'Instagram', 'icon': '🟣', 'supported': False}}
-        self.log_queue = queue.Queue(); self.log_viewer = LogViewer(self.root); self.log_viewer.withdraw()
+        self.log_queue = queue.Queue(); self.log_viewer = LogViewer(self.root, on_level_change=self.set_log_level); self.log_viewer.withdraw(); self.thumbnails = ThumbnailService()
+        self.engine = DownloadEngine(DownloadSettings(), self.log_queue, listener=lambda *event: self.root.after(0, self.on_engine_event, *event), item_factory=QueueItem); self.items, self.progress, self.file_log = self.engine.items, self.engine.progress, self.engine.file_log; self.sync_settings()
         
         self.ffmpeg_installed = self.check_ffmpeg()
         
-        self.setup_styles(); self.create_widgets(); self.root.bind('<Configure>', self.on_resize); self.select_platform('youtube'); self.process_log_queue()
+        self.setup_styles(); self.create_widgets(); self.select_platform('youtube'); self.process_log_queue(); self.process_progress(); self.process_thumbnail_queue(); self.engine.restore_queue(); self.queue_view.relayout()
         threading.Thread(target=self.check_youtube_connection, daemon=True).start()
         
         if not self.ffmpeg_installed:
@@ -177,17 +321,32 @@ class App:
 
     def check_youtube_connection(self):
         self.log_queue.put("Pinging youtube.com...\n")
+        import requests
         try: requests.head("https://www.youtube.com", timeout=5); self.log_queue.put("YouTube connection successful.\n")
         except requests.exceptions.RequestException as e:
             self.log_queue.put(f"YouTube connection failed: {e}\n")
             self.root.after(0, lambda: messagebox.showwarning("Connection Error", "Could not connect to YouTube. Please check your network or proxy settings."))
 
     def process_log_queue(self):
+        entries = []
         try:
-            while True: self.log_viewer.log(self.log_queue.get_nowait())
+            while len(entries) < LOG_BATCH_SIZE: message = self.log_queue.get_nowait(); entries.append((LOG_LEVELS.get(message.split(":", 1)[0], logging.INFO), message))
         except queue.Empty: pass
+        if entries:
+            for level, message in entries:
+                if level >= logging.WARNING: self.file_log.log(level, message.rstrip())
+            if self.log_viewer.winfo_exists(): self.log_viewer.log_batch(entries)
         self.root.after(100, self.process_log_queue)
 
+    def set_log_level(self, name): self.engine.log_level = self.log_viewer.level = LOG_LEVELS[name]; self.log_viewer.render()
+
+    def process_progress(self):
+        for item, status, percent, speed, eta in self.progress.drain():
+            if item.state != "cancelled": item.apply_progress(status, percent, speed, eta); self.queue_view.update_item(item)
+        self.root.after(1000 // PROGRESS_FPS, self.process_progress)
+
+    def process_thumbnail_queue(self): self.thumbnails.deliver(); self.root.after(50, self.process_thumbnail_queue)
+
     def setup_styles(self):
         style = ttk.Style(); style.theme_use('clam')
         style.configure("TProgressbar", background=PRIMARY_COLOR, troughcolor="#2d3748", borderwidth=0)
@@ -203,13 +362,15 @@ class App:
         self.main_view = tk.Frame(self.content_area, bg=CONTENT_COLOR); header = tk.Frame(self.main_view, bg=CONTENT_COLOR); header.pack(fill="x", padx=30, pady=20); tk.Label(header, text="Video Downloader", bg=CONTENT_COLOR, fg=TEXT_COLOR_BRIGHT, font=(FONT_FAMILY, 22, "bold")).pack(side="left")
         controls_frame = tk.Frame(header, bg=CONTENT_COLOR); controls_frame.pack(side="right"); log_btn = tk.Button(controls_frame, text="Show Log", command=self.toggle_log_viewer, bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 9), relief="flat"); log_btn.pack(side="right", padx=5); self.add_hover_effect(log_btn, TEXT_COLOR_NORMAL, TEXT_COLOR_BRIGHT, is_label=True); settings_btn = tk.Button(controls_frame, text="⚙️", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 16), relief="flat", command=self.open_settings_window); settings_btn.pack(side="right"); self.add_hover_effect(settings_btn, TEXT_COLOR_NORMAL, TEXT_COLOR_BRIGHT, is_label=True)
         url_frame = tk.Frame(self.main_view, bg=CARD_COLOR); url_frame.pack(fill="x", padx=30); self.url_entry = tk.Entry(url_frame, font=(FONT_FAMILY, 12), bg=CARD_COLOR, fg=TEXT_COLOR_NORMAL, insertbackground=PRIMARY_COLOR, relief="flat", bd=0); self.url_entry.pack(side="left", fill="x", expand=True, ipady=12, padx=(10, 0)); self.url_entry.insert(0, PLACEHOLDER_TEXT); self.url_entry.bind("<FocusIn>", self.on_url_focus_in); self.url_entry.bind("<FocusOut>", self.on_url_focus_out); self.create_url_context_menu(); self.url_entry.bind("<Button-3>", self.show_url_context_menu); clear_btn = tk.Label(url_frame, text="×", bg=CARD_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 16)); clear_btn.pack(side="right", padx=(0, 10)); clear_btn.bind("<Button-1>", self.clear_url_entry)
-        self.add_to_queue_btn = tk.Button(self.main_view, text="Get Info 📥", bg=PRIMARY_COLOR, fg=TEXT_COLOR_BRIGHT, font=(FONT_FAMILY, 10, "bold"), relief="flat", padx=20, pady=10, command=self.fetch_video_info); self.add_to_queue_btn.pack(anchor="e", padx=30, pady=(15, 20)); self.add_hover_effect(self.add_to_queue_btn, PRIMARY_COLOR, "#5a6fd8")
+        actions_frame = tk.Frame(self.main_view, bg=CONTENT_COLOR); actions_frame.pack(anchor="e", padx=30, pady=(15, 20))
+        self.add_to_queue_btn = tk.Button(actions_frame, text="Get Info 📥", bg=PRIMARY_COLOR, fg=TEXT_COLOR_BRIGHT, font=(FONT_FAMILY, 10, "bold"), relief="flat", padx=20, pady=10, command=self.fetch_video_info); self.add_to_queue_btn.pack(side="right"); self.add_hover_effect(self.add_to_queue_btn, PRIMARY_COLOR, "#5a6fd8")
+        batch_btn = tk.Button(actions_frame, text="Batch 📑", bg=SIDEBAR_COLOR, fg=TEXT_COLOR_BRIGHT, font=(FONT_FAMILY, 10, "bold"), relief="flat", padx=20, pady=10, command=self.open_batch_window); batch_btn.pack(side="right", padx=(0, 10)); self.add_hover_effect(batch_btn, SIDEBAR_COLOR, "#2c3a4f")
         tk.Label(self.main_view, text="Download Queue", bg=CONTENT_COLOR, fg=TEXT_COLOR_BRIGHT, font=(FONT_FAMILY, 16, "bold")).pack(anchor="w", padx=30)
-        canvas_frame = tk.Frame(self.main_view, bg=CONTENT_COLOR); canvas_frame.pack(fill="both", expand=True, padx=30, pady=(10, 20)); self.canvas = tk.Canvas(canvas_frame, bg=CONTENT_COLOR, highlightthickness=0); scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=self.canvas.yview); self.scrollable_frame = tk.Frame(self.canvas, bg=CONTENT_COLOR); self.scrollable_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))); self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw"); self.canvas.configure(yscrollcommand=scrollbar.set); self.canvas.pack(side="left", fill="both", expand=True); scrollbar.pack(side="right", fill="y")
+        self.queue_view = QueueView(self.main_view, self); self.queue_view.pack(fill="both", expand=True, padx=30, pady=(10, 20))
         self.coming_soon_view = tk.Frame(self.content_area, bg=CONTENT_COLOR); tk.Label(self.coming_soon_view, text="Coming Soon!", bg=CONTENT_COLOR, fg=PRIMARY_COLOR, font=(FONT_FAMILY, 30, "bold")).pack(pady=20); tk.Label(self.coming_soon_view, text="Support for this platform will be added in future updates.", bg=CONTENT_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 12)).pack()
 
     def create_platform_button(self, id, info): btn = tk.Button(self.sidebar, text=f" {info['icon']} {info['name']}", bg=SIDEBAR_COLOR, fg=TEXT_COLOR_NORMAL, font=(FONT_FAMILY, 11), relief="flat", anchor="w", command=lambda p=id: self.select_platform(p)); btn.pack(fill="x", padx=10, pady=5); self.platform_buttons[id] = btn; self.add_hover_effect(btn, SIDEBAR_COLOR, "#2c3a4f")
-    def toggle_log_viewer(self):_ = self.log_viewer.state() == "normal" and self.log_viewer.withdraw() or self.log_viewer.deiconify()
+    def toggle_log_viewer(self): self.log_viewer.withdraw() if self.log_viewer.state() == "normal" else self.log_viewer.show()
     def add_hover_effect(self, w, c_def, c_hov, is_label=False): prop = 'fg' if is_label else 'bg'; w.bind("<Enter>", lambda e: w.config(**{prop: c_hov})); w.bind("<Leave>", lambda e: w.config(**{prop: c_def}))
     def create_url_context_menu(self): self.url_context_menu = tk.Menu(self.root, tearoff=0, bg=CARD_COLOR, fg=TEXT_COLOR_BRIGHT, relief="flat", font=(FONT_FAMILY, 9)); self.url_context_menu.add_command(label="Cut", command=lambda: self.url_entry.event_generate("<<Cut>>")); self.url_context_menu.add_command(label="Copy", command=lambda: self.url_entry.event_generate("<<Copy>>")); self.url_context_menu.add_command(label="Paste", command=lambda: self.url_entry.event_generate("<<Paste>>"))
     def show_url_context_menu(self, e): self.url_context_menu.tk_popup(e.x_root, e.y_root)
@@ -218,63 +379,74 @@ class App:
     def clear_url_entry(self, e=None): self.url_entry.delete(0, "end"); self.on_url_focus_out(None)
     def select_platform(self, p_id): _ = self.platforms[p_id]['supported'] and (self.coming_soon_view.pack_forget(), self.main_view.pack(fill="both", expand=True)) or (self.main_view.pack_forget(), self.coming_soon_view.pack(fill="both", expand=True, pady=100))
     def open_settings_window(self): SettingsWindow(self.root, self)
-    def fetch_video_info(self): url = self.url_entry.get().strip();_ = url and url != PLACEHOLDER_TEXT and (self.add_to_queue_btn.config(text="Getting Info...", state="disabled"), threading.Thread(target=self._fetch_info_task, args=(url,), daemon=True).start())
+    def open_batch_window(self, text=""): BatchWindow(self.root, self, text)
+    def fetch_video_info(self):
+        url = self.url_entry.get().strip()
+        if not url or url == PLACEHOLDER_TEXT: return
+        if COLLECTION_URL_RE.search(url): self.open_batch_window(url + "\n"); return
+        self.add_to_queue_btn.config(text="Getting Info...", state="disabled"); threading.Thread(target=self._fetch_info_task, args=(url,), daemon=True).start()
 
-    def _get_ydl_opts(self):
-        ydl_opts = {'noplaylist': True, 'quiet': True, 'verbose': True, 'logger': MyLogger(self.log_queue)}
-        try: ydl_opts['socket_timeout'] = int(self.socket_timeout_var.get())
-        except (ValueError, tk.TclError): ydl_opts['socket_timeout'] = 60
-        if self.force_ipv4_var.get(): ydl_opts['source_address'] = '0.0.0.0'
+    def sync_settings(self):
+        settings = self.engine.settings; settings.download_dir = self.download_path_var.get(); settings.force_ipv4 = self.force_ipv4_var.get(); settings.proxy = settings.cookie_file = settings.cookies_from_browser = None
+        try: settings.socket_timeout = int(self.socket_timeout_var.get())
+        except (ValueError, tk.TclError): settings.socket_timeout = 60
         proxy_method = self.proxy_method_var.get()
-        if proxy_method == "system": ydl_opts['proxy'] = ":".join(webbrowser.get().name.split())
-        elif proxy_method == "manual":
-            proxy_address = self.proxy_address_var.get().strip();_ = proxy_address and ydl_opts.update({'proxy': proxy_address})
+        if proxy_method == "system": settings.proxy = ":".join(webbrowser.get().name.split())
+        elif proxy_method == "manual": settings.proxy = self.proxy_address_var.get().strip() or None
         if self.use_cookies_var.get():
-            if self.cookie_source_var.get() == "file" and self.cookie_path_var.get() and os.path.exists(self.cookie_path_var.get()): ydl_opts['cookiefile'] = self.cookie_path_var.get()
+            if self.cookie_source_var.get() == "file" and self.cookie_path_var.get() and os.path.exists(self.cookie_path_var.get()): settings.cookie_file = self.cookie_path_var.get()
             elif self.cookie_source_var.get() == "browser" and self.browser_cookie_var.get():
                 browser, profile = self.browser_cookie_var.get(), self.browser_profile_var.get().strip()
-                ydl_opts['cookies_from_browser'] = (browser, profile) if profile else (browser,)
-        return ydl_opts
+                settings.cookies_from_browser = (browser, profile) if profile else (browser,)
+        settings.skip_archived = self.skip_archived_var.get()
+        try: settings.max_concurrent, settings.max_per_host, settings.connections, settings.postprocess_workers = int(self.max_concurrent_var.get()), int(self.max_per_host_var.get()), max(1, int(self.connections_var.get())), max(0, int(self.postprocess_workers_var.get())); self.engine.apply_limits()
+        except (ValueError, tk.TclError): self.log_queue.put("Invalid download queue limits, keeping the previous values.\n")
 
     def _fetch_info_task(self, url):
         try:
-            self.log_queue.put(f"--- Getting info for: {url} ---\n"); ydl_opts = self._get_ydl_opts()
-            with YoutubeDL(ydl_opts) as ydl: info = ydl.extract_info(url, download=False); info['original_url'] = url; self.root.after(0, self.show_quality_selection, info)
+            self.log_queue.put(f"--- Getting info for: {url} ---\n"); info = self.engine.get_info(url); info['original_url'] = url; self.root.after(0, self.show_quality_selection, info)
         except Exception as e: self.root.after(0, messagebox.showerror, "Error", f"Could not get video info:\n{e}")
         finally: self.root.after(0, self.add_to_queue_btn.config, {'text': "Get Info 📥", 'state': "normal"})
     
     def show_quality_selection(self, info): QualitySelectionWindow(self.root, self, info)
     
-    def _create_download_task(self, url, format_id, info):
-        download_dir = self.download_path_var.get()
+    def _ensure_download_dir(self):
+        self.sync_settings(); download_dir = self.download_path_var.get()
         if not os.path.exists(download_dir):
             if messagebox.askyesno("Create Folder?", f"The download folder '{download_dir}' does not exist.\n\nDo you want to create it?"):
                 try: os.makedirs(download_dir); self.log_queue.put(f"Created download directory: {download_dir}\n")
-                except Exception as e: messagebox.showerror("Error", f"Could not create directory:\n{e}"); return
-            else: return
-        card = DownloadCard(self.scrollable_frame, info, url, format_id, self); self.on_resize(); self.start_download_thread(card)
+                except Exception as e: messagebox.showerror("Error", f"Could not create directory:\n{e}"); return False
+            else: return False
+        return True
+
+    def _create_download_task(self, url, format_id, info):
+        if not self._ensure_download_dir() or self.engine.add(info, url, format_id): return
+        if messagebox.askyesno("Already Downloaded", f"'{info.get('title', url)}' has already been downloaded in this quality.\n\nDo you want to download it again?"): self.engine.add(info, url, format_id, force=True)
 
-    def start_download_thread(self, card):
-        card.state = "downloading"; card.download_thread = threading.Thread(target=self.download_thread, args=(card,), daemon=True); card.download_thread.start()
+    def start_batch(self, sources, format_id):
+        if not self._ensure_download_dir(): return False
+        self.engine.start_batch(sources, format_id); return True
 
-    def download_thread(self, card):
-        try:
-            self.log_queue.put(f"--- Starting/Resuming download for: {card.url} ---\n")
-            download_dir = self.download_path_var.get()
-            ydl_opts = self._get_ydl_opts()
-            ydl_opts.update({'quiet': False, 'progress_hooks': [card.update_progress], 'format': card.format_id, 'outtmpl': os.path.join(download_dir, '%(title)s.%(ext)s'), 'merge_output_format': 'mp4'})
-            with YoutubeDL(ydl_opts) as ydl: ydl.download([card.url])
-        except CustomError: self.root.after(0, self.handle_pause, card)
-        except Exception as e: self.root.after(0, self.handle_error, card, e)
-
-    def handle_pause(self, card): card.state = "paused"; card.status_label.config(text="Paused"); card.pause_resume_button.config(text="Resume", state="normal"); self.log_queue.put(f"Download paused for {card.url}\n")
-    def handle_error(self, card, error): card.state = "error"; card.status_label.config(text="Error!", fg="#ff6b6b"); card.pause_resume_button.config(state="disabled"); self.log_queue.put(f"--- DOWNLOAD FAILED FOR: {card.url} ---\nERROR: {error}\n")
-    def on_resize(self, event=None):
-        self.root.update_idletasks(); container_width = self.scrollable_frame.winfo_width()
-        max_cols = max(1, (container_width - 20) // 420)
-        for i, card in enumerate(self.scrollable_frame.winfo_children()): card.grid(row=i // max_cols, column=i % max_cols, padx=10, pady=10, sticky="ew")
-        for i in range(max_cols): self.scrollable_frame.grid_columnconfigure(i, weight=1)
+    def on_engine_event(self, event, item, *args):
+        if event in ("added", "removed"): self.queue_view.relayout(); return
+        if item.state == "cancelled" or item not in self.items: return
+        if event == "paused": item.set_status("Paused"); item.pause_text, item.pause_state = "Resume", "normal"
+        elif event == "error": item.set_status("Error!", "#ff6b6b"); item.pause_state = "disabled"
+        elif event == "processing": item.set_status("Processing..."); item.pause_state = "disabled"
+        elif event == "finished": item.set_status("Completed!", "#4ade80"); item.percent, item.pause_state, item.cancel_text = 100, "disabled", "Remove"
+        self.queue_view.update_item(item)
+
+    def move_item(self, item, offset):_ = (self.engine.move_to_top(item) if offset is None else self.engine.move(item, offset)) and self.queue_view.refresh()
+
+    def toggle_pause_resume(self, item):
+        state = item.state
+        if state == "downloading" and self.engine.pause(item): item.set_status("Pausing..."); item.pause_text, item.pause_state = "Pausing...", "disabled"
+        elif state == "queued": self.engine.pause(item)
+        elif self.engine.resume(item): item.set_status("Resuming..."); item.pause_text, item.pause_state = "Pause", "normal"
+        self.queue_view.update_item(item)
+
+    def cancel_download(self, item): self.engine.remove(item)
 
 if __name__ == "__main__":
-    if YoutubeDL is None: print("Error: yt-dlp library is required to run this application.\nPlease install it using: pip install yt-dlp")
-    else: root = tk.Tk(); app = App(root); root.mainloop()
+    if not yt_dlp_available(): print("Error: yt-dlp library is required to run this application.\nPlease install it using: pip install yt-dlp")
+    else: multiprocessing.freeze_support(); root = tk.Tk(); app = App(root); root.mainloop(); app.engine.flush_queue()
@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import re
+import shutil
+import tempfile
+import platform
+import threading
+import statistics
+import argparse
+import importlib.util
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Configuration ---
+HERE = os.path.dirname(os.path.abspath(__file__))
+GUI_FILE = os.path.join(HERE, "CAA Downloader v1.py")
+HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".caa_downloader", "bench_history.jsonl")
+BENCHMARKS = ("throughput", "concurrency", "info", "thumbnails", "mainloop")
+RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+MiB = 1024 * 1024
+
+class TokenBucket:
+    def __init__(self, rate): self.rate = rate; self.lock = threading.Lock(); self.stamp = time.monotonic(); self.debt = 0.0
+
+    def take(self, amount):
+        if not self.rate: return
+        with self.lock:
+            now = time.monotonic(); self.debt = max(0.0, self.debt - (now - self.stamp) * self.rate) + amount; self.stamp = now; delay = self.debt / self.rate
+        time.sleep(delay)
+
+class StandInServer:
+    def __init__(self, latency=0.05, rate=None, total_rate=None, media_size=8 * MiB):
+        self.latency, self.rate, self.media = latency, rate, os.urandom(media_size); self.total = TokenBucket(total_rate); self.thumbnail = self._make_thumbnail(); self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def log_message(self, *args): pass
+            def do_HEAD(self): self.respond(head=True)
+            def do_GET(self): self.respond()
+
+            def respond(self, head=False):
+                server.requests += 1; time.sleep(server.latency)
+                if self.path.startswith("/media/"): body, kind = server.media, "video/mp4"
+                elif self.path.startswith("/thumb/") and server.thumbnail: body, kind = server.thumbnail, "image/jpeg"
+                else: self.send_error(404); return
+                match = RANGE_RE.match(self.headers.get("Range") or ""); start, end = 0, len(body) - 1
+                if match:
+                    start, end = int(match.group(1)), min(int(match.group(2)) if match.group(2) else len(body) - 1, len(body) - 1)
+                    if start > end: self.send_response(416); self.send_header("Content-Range", f"bytes */{len(body)}"); self.send_header("Content-Length", "0"); self.end_headers(); return
+                    self.send_response(206); self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+                else: self.send_response(200)
+                self.send_header("Content-Type", kind); self.send_header("Accept-Ranges", "bytes"); self.send_header("Content-Length", str(end - start + 1)); self.end_headers()
+                if head: return
+                bucket = TokenBucket(server.rate)
+                try:
+                    for offset in range(start, end + 1, 64 * 1024):
+                        chunk = body[offset:min(end + 1, offset + 64 * 1024)]; bucket.take(len(chunk)); server.total.take(len(chunk)); self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError): pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler); self.httpd.daemon_threads = True
+
+    @staticmethod
+    def _make_thumbnail():
+        try: from PIL import Image
+        except ImportError: return None
+        from io import BytesIO
+        image = Image.linear_gradient("L").resize((1280, 720)).convert("RGB"); buffer = BytesIO(); image.save(buffer, "JPEG", quality=85); return buffer.getvalue()
+
+    def url(self, path): return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+    def __enter__(self): threading.Thread(target=self.httpd.serve_forever, daemon=True).start(); return self
+    def __exit__(self, *exc): self.httpd.shutdown(); self.httpd.server_close()
+
+def load_gui():
+    spec = importlib.util.spec_from_file_location("caa_gui", GUI_FILE); module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module); return module
+
+def percentiles(values):
+    if not values: return {}
+    ordered = sorted(values); pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {'p50': round(pick(0.5), 2), 'p95': round(pick(0.95), 2), 'max': round(ordered[-1], 2), 'mean': round(statistics.fmean(ordered), 2)}
+
+def wait_until(condition, timeout, pump=None):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline: raise TimeoutError("benchmark step timed out")
+        pump() if pump else time.sleep(0.01)
+
+# --- Benchmarks ---
+def bench_throughput(server, args, workdir):
+    from caa_engine import SegmentedDownload
+    results = {}
+    for connections in args.connections:
+        path = os.path.join(workdir, f"throughput-{connections}.mp4"); started = time.monotonic()
+        SegmentedDownload(server.url(f"/media/throughput-{connections}.mp4"), path, connections=connections).run(); elapsed = time.monotonic() - started
+        results[f"{connections}_connections"] = {'seconds': round(elapsed, 3), 'mib_per_s': round(os.path.getsize(path) / MiB / elapsed, 2)}; os.remove(path)
+    return results
+
+def bench_concurrency(server, args, workdir):
+    from caa_engine import DownloadEngine, DownloadSettings
+    results = {}
+    for level in args.levels:
+        engine = DownloadEngine(DownloadSettings(download_dir=os.path.join(workdir, f"concurrency-{level}"), max_concurrent=level, max_per_host=level, connections=args.segment_connections), queue_file=None)
+        urls = [server.url(f"/media/c{level}-{i}.mp4") for i in range(args.items)]; started = time.monotonic()
+        for url in urls: engine.add({'title': url.rsplit("/", 1)[1]}, url, "best")
+        wait_until(lambda: not engine.busy(), args.timeout); elapsed = time.monotonic() - started; metrics = engine.metrics.snapshot()
+        results[f"{level}_active"] = {'seconds': round(elapsed, 3), 'mib_per_s': round(metrics['bytes'] / MiB / elapsed, 2), 'failed': metrics['downloads']['error'], **{f"avg_{phase}": stat['avg'] for phase, stat in metrics['phases'].items()}}
+        shutil.rmtree(engine.settings.download_dir, ignore_errors=True)
+    best = max(r['mib_per_s'] for r in results.values())
+    results['recommended_max_concurrent'] = next(level for level in args.levels if results[f"{level}_active"]['mib_per_s'] >= best * 0.95)
+    return results
+
+def bench_info(server, args, workdir):
+    from caa_engine import DownloadEngine
+    engine = DownloadEngine(queue_file=None); url = server.url("/media/info.mp4"); results = {}
+    for label in ("cold", "warm"): started = time.monotonic(); engine.get_info(url); results[f"get_info_{label}_ms"] = round((time.monotonic() - started) * 1000, 1)
+    results.update(time_to_quality_dialog(server.url("/media/dialog.mp4"), args))
+    return results
+
+def time_to_quality_dialog(url, args):
+    import tkinter as tk
+    try: root = tk.Tk(); root.withdraw()
+    except tk.TclError as e: return {'quality_dialog': f"skipped: {e}"}
+    gui = load_gui(); shown = []
+
+    class BenchApp(gui.App):
+        def check_youtube_connection(self): pass
+        def show_ffmpeg_warning(self): pass
+        def show_quality_selection(self, info): shown.append(time.monotonic())
+
+    try:
+        app = BenchApp(root); results = {}
+        for label in ("cold", "warm"):
+            started = time.monotonic(); threading.Thread(target=app._fetch_info_task, args=(url,), daemon=True).start()
+            wait_until(lambda: len(shown) == (1 if label == "cold" else 2), args.timeout, root.update); results[f"quality_dialog_{label}_ms"] = round((shown[-1] - started) * 1000, 1)
+        return results
+    finally: root.destroy()
+
+def bench_thumbnails(server, args, workdir):
+    if server.thumbnail is None: return {'skipped': "Pillow is not installed"}
+    gui = load_gui(); directory = os.path.join(workdir, "thumbnails"); urls = [server.url(f"/thumb/{i}.jpg") for i in range(args.thumbnails)]; results = {}
+
+    def load_all(service):
+        timings = []; started = time.monotonic()
+        for i, url in enumerate(urls): service.request(f"bench:{i}", url, lambda image, begun=time.monotonic(): timings.append((time.monotonic() - begun) * 1000))
+        wait_until(lambda: len(timings) == len(urls), args.timeout, lambda: (service.deliver(), time.sleep(0.002)))
+        return {'total_ms': round((time.monotonic() - started) * 1000, 1), **percentiles(timings)}
+
+    service = gui.ThumbnailService(directory); results['network'] = load_all(service); results['memory'] = load_all(service)
+    results['disk'] = load_all(gui.ThumbnailService(directory)); return results
+
+def bench_mainloop(server, args, workdir):
+    import tkinter as tk
+    try: root = tk.Tk(); root.geometry("1000x700")
+    except tk.TclError as e: return {'skipped': str(e)}
+    gui = load_gui(); stop = threading.Event(); lags = []
+
+    class BenchApp(gui.App):
+        def check_youtube_connection(self): pass
+        def show_ffmpeg_warning(self): pass
+
+    try:
+        app = BenchApp(root); items = [app.engine.add({'title': f"Card {i}", 'uploader': "bench"}, server.url(f"/media/card{i}.mp4"), "best", start=False) for i in range(args.cards)]
+        for item in items: item.state = "downloading"
+
+        def feed():
+            total, done = 100 * MiB, 0
+            while not stop.wait(0.02):
+                done = (done + MiB) % total
+                for item in items: app.progress.report(item, 'downloading', done, total)
+        threading.Thread(target=feed, daemon=True).start(); root.update()
+
+        def tick(expected):
+            lags.append(max(0.0, (time.monotonic() - expected) * 1000))
+            if not stop.is_set(): root.after(10, tick, time.monotonic() + 0.01)
+        root.after(10, tick, time.monotonic() + 0.01); deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline: root.update()
+        stop.set(); return {'cards': args.cards, 'ticks': len(lags), 'lag_ms': percentiles(lags)}
+    finally: stop.set(); root.destroy()
+
+# --- History ---
+def flatten(data, prefix=""):
+    for key, value in data.items():
+        if isinstance(value, dict): yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool): yield f"{prefix}{key}", value
+
+def compare(previous, current):
+    old = dict(flatten(previous['results']))
+    for key, value in flatten(current['results']):
+        if old.get(key): print(f"  {key:<55} {old[key]:>10} -> {value:<10} ({(value - old[key]) / old[key] * 100:+.1f}%)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="caa_bench", description="Offline CAA Downloader benchmarks against a local stand-in server.")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="comma separated list of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--latency", type=float, default=50, help="simulated latency per request in ms"); parser.add_argument("--rate", type=float, default=4096, help="bandwidth cap per connection in KiB/s (0 = unlimited)"); parser.add_argument("--total-rate", type=float, default=0, help="shared bandwidth cap in KiB/s (0 = unlimited)")
+    parser.add_argument("--size", type=float, default=8, help="synthetic media size in MiB"); parser.add_argument("--connections", type=lambda v: [int(c) for c in v.split(",")], default=[1, 2, 4, 8], help="segment connections to compare")
+    parser.add_argument("--levels", type=lambda v: [int(c) for c in v.split(",")], default=[1, 2, 4, 8], help="simultaneous downloads to compare"); parser.add_argument("--items", type=int, default=8, help="downloads per concurrency level"); parser.add_argument("--segment-connections", type=int, default=1, help="connections per download in the concurrency benchmark")
+    parser.add_argument("--thumbnails", type=int, default=100); parser.add_argument("--cards", type=int, default=200, help="active download cards for the main-loop benchmark"); parser.add_argument("--seconds", type=float, default=5, help="main-loop measurement time")
+    parser.add_argument("--timeout", type=float, default=300); parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--history", default=HISTORY_FILE, help="append results to this JSON-lines file"); parser.add_argument("--no-history", action="store_true"); parser.add_argument("--compare", action="store_true", help="compare against the last run with the same parameters")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv); selected = [name for name in args.only.split(",") if name]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown: print(f"Error: unknown benchmark(s): {', '.join(sorted(unknown))}", file=sys.stderr); return 2
+    workdir = tempfile.mkdtemp(prefix="caa-bench-"); os.environ["HOME"] = os.environ["USERPROFILE"] = workdir; sys.path.insert(0, HERE)
+    from caa_engine import yt_dlp_available
+    params = {k: v for k, v in vars(args).items() if k not in ("only", "json", "history", "no_history", "compare", "timeout")}; results = {}
+    try:
+        with StandInServer(args.latency / 1000, args.rate * 1024 or None, args.total_rate * 1024 or None, int(args.size * MiB)) as server:
+            for name in selected:
+                if name in ("concurrency", "info") and not yt_dlp_available(): results[name] = {'skipped': "yt-dlp is not installed"}; continue
+                if not args.json: print(f"--- {name} ---", flush=True)
+                results[name] = globals()[f"bench_{name}"](server, args, workdir)
+                if not args.json: print(json.dumps(results[name], indent=2), flush=True)
+    finally: shutil.rmtree(workdir, ignore_errors=True)
+    record = {'time': time.strftime("%Y-%m-%dT%H:%M:%S"), 'python': platform.python_version(), 'platform': platform.platform(), 'params': params, 'results': results}
+    if args.json: print(json.dumps(record, indent=2))
+    if args.compare:
+        previous = None
+        try:
+            with open(args.history, encoding="utf-8") as f: previous = next((r for r in reversed([json.loads(line) for line in f if line.strip()]) if r.get('params') == params), None)
+        except (OSError, ValueError): pass
+        if previous: print(f"--- compared with {previous['time']} ---"); compare(previous, record)
+        else: print("No earlier run with the same parameters to compare against.")
+    if not args.no_history:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f: f.write(json.dumps(record) + "\n")
+    return 0
+
+if __name__ == "__main__": sys.exit(main())
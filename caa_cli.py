@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import queue
+import threading
+import time
+import hmac
+import socket
+import secrets
+import argparse
+import multiprocessing
+from caa_engine import APP_DATA_DIR, QUALITY_PRESETS, LOG_LEVELS, SEGMENT_CONNECTIONS, POSTPROCESS_WORKERS, DownloadSettings, DownloadEngine, parse_url_list, yt_dlp_available
+
+# --- Configuration ---
+DAEMON_QUEUE_FILE = os.path.join(APP_DATA_DIR, "daemon_queue.json")
+DAEMON_PORT = 47601
+DAEMON_SOCKET = os.path.join(APP_DATA_DIR, "daemon.sock")
+DAEMON_TOKEN_FILE = os.path.join(APP_DATA_DIR, "daemon.token")
+UNIX_SOCKETS = hasattr(socket, "AF_UNIX") and os.name != "nt"
+FORMAT_ALIASES = {"best": QUALITY_PRESETS["Best Available"], "1080p": QUALITY_PRESETS["1080p"], "720p": QUALITY_PRESETS["720p"], "audio": QUALITY_PRESETS["Audio Only (MP3)"]}
+
+def settings_from_args(args):
+    settings = DownloadSettings(socket_timeout=args.timeout, force_ipv4=args.ipv4, proxy=args.proxy, cookie_file=args.cookies, max_concurrent=args.jobs, max_per_host=args.per_host, connections=args.connections, postprocess_workers=args.pp_workers, skip_archived=not args.force)
+    if args.output: settings.download_dir = os.path.abspath(args.output)
+    if args.cookies_from_browser: settings.cookies_from_browser = tuple(args.cookies_from_browser.split(":", 1))
+    return settings
+
+def drain_log(log_queue, quiet):
+    try:
+        while True:
+            message = log_queue.get_nowait()
+            if not quiet or LOG_LEVELS.get(message.split(":", 1)[0], 0) >= LOG_LEVELS["WARNING"]: sys.stderr.write(message)
+    except queue.Empty: pass
+
+def format_progress(item, percent, speed, eta):
+    text = f"[{item.uid}] {(item.info.get('title') or item.url)[:50]}: " + (f"{percent:5.1f}%" if percent is not None else "...")
+    if speed: text += f" {speed / 1024 / 1024:.2f} MiB/s"
+    if speed and eta is not None: text += f" ETA {int(eta) // 60}:{int(eta) % 60:02d}"
+    return text
+
+def describe(item, percent=None): return {'id': item.uid, 'url': item.url, 'title': item.info.get('title'), 'format': item.format_id, 'state': item.state, 'priority': item.priority, 'percent': percent, 'downloaded': item.downloaded, 'total': item.total, 'timings': item.metrics()}
+def format_timings(item): return f"[{item.uid}] done: " + ", ".join(f"{phase.replace('_', ' ')} {value:.2f}s" for phase, value in item.metrics().items() if value is not None)
+
+def write_metrics(engine, path):
+    with open(path, "w", encoding="utf-8") as f: f.write(engine.export_metrics("prometheus" if path.endswith((".prom", ".txt")) else "json"))
+
+# --- One-shot downloads ---
+def run_get(args):
+    sources = list(args.urls)
+    if args.batch_file:
+        with open(args.batch_file, encoding="utf-8", errors="replace") as f: sources += parse_url_list(f.read())
+    if not sources: print("Error: no links given.", file=sys.stderr); return 2
+    os.makedirs(args.output or DownloadSettings().download_dir, exist_ok=True)
+    done = threading.Event(); failures = []
+    def on_event(event, item, *rest):
+        if event == "error": failures.append(item)
+        elif event == "finished" and not args.quiet: print(format_timings(item), flush=True)
+    engine = DownloadEngine(settings_from_args(args), queue_file=None, listener=on_event)
+    batch = engine.start_batch(sources, FORMAT_ALIASES.get(args.format, args.format), args.priority)
+    try:
+        while not done.is_set():
+            time.sleep(1); drain_log(engine.log_queue, args.quiet)
+            if not args.quiet:
+                for item, status, percent, speed, eta in engine.progress.drain():
+                    if status == 'downloading': print(format_progress(item, percent, speed, eta), flush=True)
+            if not batch.is_alive() and not engine.busy(): done.set()
+    except KeyboardInterrupt:
+        for item in list(engine.items): engine.remove(item)
+        drain_log(engine.log_queue, args.quiet); print("Interrupted.", file=sys.stderr); return 130
+    drain_log(engine.log_queue, args.quiet)
+    finished = sum(1 for item in engine.items if item.state == "finished")
+    skipped = engine.metrics.downloads["skipped"]; print(f"{finished} finished, {len(failures)} failed, {skipped} already downloaded, {len(engine.items) + skipped} total.")
+    if args.metrics: write_metrics(engine, args.metrics)
+    return 1 if failures or not (engine.items or skipped) else 0
+
+# --- Daemon ---
+class Daemon:
+    def __init__(self, args):
+        self.args = args; self.engine = DownloadEngine(settings_from_args(args), queue_file=args.queue_file); self.percent = {}; self.stop = threading.Event(); self.token = None
+
+    def handle(self, request):
+        command = request.get('cmd'); engine = self.engine
+        if self.token and not hmac.compare_digest(str(request.get('token') or ""), self.token): return {'ok': False, 'error': "not authorized"}
+        if command == "add":
+            sources = [u for u in request.get('urls') or [] if u]
+            if not sources: return {'ok': False, 'error': "no urls"}
+            engine.start_batch(sources, FORMAT_ALIASES.get(request.get('format') or "best", request.get('format')), int(request.get('priority') or 0)); return {'ok': True, 'queued': len(sources)}
+        if command == "list": return {'ok': True, 'items': [describe(item, self.percent.get(item)) for item in list(engine.items)]}
+        if command == "limits":
+            engine.settings.max_concurrent = int(request.get('max_concurrent') or engine.settings.max_concurrent); engine.settings.max_per_host = int(request.get('max_per_host') or engine.settings.max_per_host); engine.apply_limits()
+            return {'ok': True, 'max_concurrent': engine.settings.max_concurrent, 'max_per_host': engine.settings.max_per_host}
+        if command == "metrics": return {'ok': True, 'format': request.get('format') or "json", 'metrics': engine.export_metrics(request.get('format') or "json")}
+        if command == "shutdown": self.stop.set(); return {'ok': True}
+        if command in ("pause", "resume", "remove", "up", "down", "top"):
+            item = engine.find(request.get('id'))
+            if item is None: return {'ok': False, 'error': f"no item with id {request.get('id')}"}
+            if command == "pause": return {'ok': engine.pause(item)}
+            if command == "resume": return {'ok': engine.resume(item)}
+            if command == "remove": engine.remove(item); self.percent.pop(item, None); return {'ok': True}
+            if command == "top": return {'ok': engine.move_to_top(item)}
+            return {'ok': engine.move(item, -1 if command == "up" else 1)}
+        return {'ok': False, 'error': f"unknown command {command!r}"}
+
+    def serve(self):
+        import socketserver
+        daemon = self
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try: response = daemon.handle(json.loads(line))
+                    except (ValueError, TypeError, AttributeError) as e: response = {'ok': False, 'error': str(e)}
+                    self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8")); self.wfile.flush()
+        server = self.control_server(socketserver, Handler)
+        if server is None: return 2
+        server.daemon_threads = True; threading.Thread(target=server.serve_forever, daemon=True).start()
+        if self.args.metrics_port: self.serve_metrics(self.args.metrics_port)
+        self.engine.restore_queue(); print(f"CAA daemon listening on {self.args.socket if UNIX_SOCKETS else f'127.0.0.1:{server.server_address[1]}'}", flush=True)
+        try:
+            while not self.stop.wait(1):
+                drain_log(self.engine.log_queue, self.args.quiet)
+                for item, status, percent, speed, eta in self.engine.progress.drain(): self.percent[item] = 100.0 if status == 'finished' else percent
+        except KeyboardInterrupt: pass
+        server.shutdown(); server.server_close(); self.engine.flush_queue(); drain_log(self.engine.log_queue, self.args.quiet)
+        for path in [self.args.socket if UNIX_SOCKETS else DAEMON_TOKEN_FILE]:
+            try: os.remove(path)
+            except OSError: pass
+        if self.args.metrics: write_metrics(self.engine, self.args.metrics)
+        return 0
+
+    def control_server(self, socketserver, handler):
+        if not UNIX_SOCKETS:
+            self.token = secrets.token_hex(16); os.makedirs(APP_DATA_DIR, exist_ok=True)
+            with open(os.open(DAEMON_TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f: f.write(self.token)
+            socketserver.ThreadingTCPServer.allow_reuse_address = True; return socketserver.ThreadingTCPServer(("127.0.0.1", self.args.port), handler)
+        path = self.args.socket; os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+        if os.path.exists(path):
+            try:
+                with socket.socket(socket.AF_UNIX) as probe: probe.connect(path)
+                print(f"Error: a daemon is already listening on {path}", file=sys.stderr); return None
+            except OSError: os.remove(path)
+        umask = os.umask(0o177)
+        try: server = socketserver.ThreadingUnixStreamServer(path, handler)
+        finally: os.umask(umask)
+        os.chmod(path, 0o600); return server
+
+    def serve_metrics(self, port):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        engine = self.engine
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args): pass
+            def do_GET(self):
+                fmt = {"/metrics": "prometheus", "/metrics.json": "json"}.get(self.path)
+                if fmt is None: self.send_error(404); return
+                body = engine.export_metrics(fmt).encode("utf-8"); self.send_response(200); self.send_header("Content-Type", "text/plain; version=0.0.4" if fmt == "prometheus" else "application/json"); self.send_header("Content-Length", str(len(body))); self.end_headers(); self.wfile.write(body)
+        server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler); server.daemon_threads = True; threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Metrics available at http://127.0.0.1:{server.server_address[1]}/metrics", flush=True)
+
+def connect_daemon(args, request):
+    if UNIX_SOCKETS: sock = socket.socket(socket.AF_UNIX); sock.settimeout(10); sock.connect(args.socket); return sock
+    with open(DAEMON_TOKEN_FILE, encoding="utf-8") as f: request['token'] = f.read().strip()
+    return socket.create_connection(("127.0.0.1", args.port), timeout=10)
+
+def run_ctl(args):
+    request = {'cmd': args.command}
+    if args.command == "add": request.update({'urls': args.args, 'format': args.format, 'priority': args.priority})
+    elif args.command in ("pause", "resume", "remove", "up", "down", "top"):
+        if not args.args: print(f"Error: {args.command} needs an item id.", file=sys.stderr); return 2
+        try: request['id'] = int(args.args[0])
+        except ValueError: print(f"Error: {args.args[0]!r} is not an item id.", file=sys.stderr); return 2
+    elif args.command == "metrics": request['format'] = args.args[0] if args.args else "json"
+    elif args.command == "limits": request.update({'max_concurrent': args.args[0] if args.args else None, 'max_per_host': args.args[1] if len(args.args) > 1 else None})
+    try:
+        with connect_daemon(args, request) as sock:
+            sock.sendall((json.dumps(request) + "\n").encode("utf-8")); response = json.loads(sock.makefile(encoding="utf-8").readline())
+    except OSError as e: print(f"Error: could not reach the daemon at {args.socket if UNIX_SOCKETS else f'127.0.0.1:{args.port}'}: {e}", file=sys.stderr); return 2
+    if args.command == "list" and response.get('ok'):
+        for item in response['items']: print(f"{item['id']:>4}  {item['state']:<11} {'' if item['percent'] is None else format(item['percent'], '5.1f') + '%':>6}  {(item['title'] or item['url'])[:60]}")
+    elif args.command == "metrics" and response.get('ok'): print(response['metrics'])
+    else: print(json.dumps(response, ensure_ascii=False))
+    return 0 if response.get('ok') else 1
+
+def add_download_options(parser):
+    parser.add_argument("-o", "--output", help="download folder"); parser.add_argument("--metrics", metavar="FILE", help="write download metrics as JSON, or Prometheus text for .prom/.txt files")
+    parser.add_argument("--proxy"); parser.add_argument("--cookies", metavar="FILE", help="Netscape cookie file"); parser.add_argument("--cookies-from-browser", metavar="BROWSER[:PROFILE]")
+    parser.add_argument("--timeout", type=int, default=60, help="network timeout in seconds"); parser.add_argument("--ipv4", action="store_true", help="force IPv4")
+    parser.add_argument("-j", "--jobs", type=int, default=3, help="simultaneous downloads"); parser.add_argument("--per-host", type=int, default=2, help="simultaneous downloads per site"); parser.add_argument("-c", "--connections", type=int, default=SEGMENT_CONNECTIONS, help="connections per download")
+    parser.add_argument("--pp-workers", type=int, default=POSTPROCESS_WORKERS, help="merge/transcode processes (0 = run inline)"); parser.add_argument("--force", action="store_true", help="download items that are already in the download archive")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print warnings and errors")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="caa_cli", description="Headless CAA Downloader.")
+    commands = parser.add_subparsers(dest="mode", required=True)
+    get = commands.add_parser("get", help="download links and exit"); get.add_argument("urls", nargs="*"); get.add_argument("-a", "--batch-file", metavar="FILE", help="read links from a file, one per line"); get.add_argument("-f", "--format", default="best", help="best, 1080p, 720p, audio or a yt-dlp format string"); get.add_argument("-p", "--priority", type=int, default=0, help="queue priority (higher starts first)"); add_download_options(get)
+    daemon = commands.add_parser("daemon", help="run a download daemon with a local control socket"); daemon.add_argument("--socket", default=DAEMON_SOCKET, help="control socket path"); daemon.add_argument("--port", type=int, default=DAEMON_PORT, help="control port where Unix sockets are unavailable"); daemon.add_argument("--queue-file", default=DAEMON_QUEUE_FILE); daemon.add_argument("--metrics-port", type=int, help="serve Prometheus metrics over HTTP on this port"); add_download_options(daemon)
+    ctl = commands.add_parser("ctl", help="control a running daemon"); ctl.add_argument("command", choices=["add", "list", "pause", "resume", "remove", "up", "down", "top", "limits", "metrics", "shutdown"]); ctl.add_argument("args", nargs="*"); ctl.add_argument("-f", "--format", default="best"); ctl.add_argument("-p", "--priority", type=int, default=0, help="queue priority for added links (higher starts first)"); ctl.add_argument("--socket", default=DAEMON_SOCKET); ctl.add_argument("--port", type=int, default=DAEMON_PORT)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.mode == "ctl": return run_ctl(args)
+    if not yt_dlp_available(): print("Error: yt-dlp library is required.\nPlease install it using: pip install yt-dlp", file=sys.stderr); return 2
+    return run_get(args) if args.mode == "get" else Daemon(args).serve()
+
+if __name__ == "__main__": multiprocessing.freeze_support(); sys.exit(main())
@@ -0,0 +1,629 @@
+import os
+import threading
+import queue
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+import re
+import time
+import hashlib
+import itertools
+import importlib.util
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# --- Configuration ---
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".caa_downloader")
+DEFAULT_DOWNLOAD_DIR = os.path.join(os.path.expanduser("~"), "Videos", "CAA Downloader")
+QUEUE_FILE = os.path.join(APP_DATA_DIR, "queue.json")
+QUEUE_SAVE_DELAY = 0.5
+ARCHIVE_FILE = os.path.join(APP_DATA_DIR, "archive.sqlite3")
+INFO_CACHE_DIR = os.path.join(APP_DATA_DIR, "info_cache")
+INFO_CACHE_TTL = 3 * 60 * 60
+INFO_CACHE_MAX_BYTES = 64 * 1024 * 1024
+SPEED_SMOOTHING = 0.3
+YOUTUBE_ID_RE = re.compile(r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([\w-]{11})")
+LOG_FILE = os.path.join(APP_DATA_DIR, "caa_downloader.log")
+LOG_FILE_MAX_BYTES = 2 * 1024 * 1024
+LOG_LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR}
+BATCH_WORKERS = 4
+BATCH_LOOKAHEAD = 16
+COLLECTION_URL_RE = re.compile(r"youtube\.com/(?:playlist\?|@|channel/|c/|user/)")
+QUALITY_PRESETS = {"Best Available": "bestvideo*+bestaudio/best", "1080p": "bestvideo[height<=1080]+bestaudio/best", "720p": "bestvideo[height<=720]+bestaudio/best", "Audio Only (MP3)": "bestaudio/best"}
+PERSISTED_INFO_KEYS = ('id', 'title', 'uploader', 'thumbnail', 'original_url', 'webpage_url', 'extractor_key')
+SEGMENT_CONNECTIONS = 4
+MIN_SEGMENT_SIZE = 1024 * 1024
+SEGMENT_READ_SIZE = 64 * 1024
+SEGMENT_RETRIES = 3
+SEGMENT_TICK = 0.1
+SEGMENT_SAVE_INTERVAL = 1.0
+CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+)")
+POSTPROCESS_WORKERS = 2
+POSTPROCESS_PARAMS = ('ffmpeg_location', 'merge_output_format', 'final_ext', 'postprocessors', 'postprocessor_args', 'keepvideo', 'overwrites', 'fixup', 'paths', 'outtmpl', 'prefer_ffmpeg', 'hls_use_mpegts')
+
+class CustomError(Exception): pass
+class SegmentError(OSError): pass
+
+def yt_dlp_available(): return importlib.util.find_spec("yt_dlp") is not None
+def parse_url_list(text): return [line.strip() for line in text.splitlines() if line.strip() and not line.strip().startswith(('#', ';'))]
+
+def create_file_logger(path=LOG_FILE):
+    logger = logging.getLogger("caa_downloader"); logger.setLevel(logging.INFO); logger.propagate = False
+    if not logger.handlers:
+        try: os.makedirs(os.path.dirname(path), exist_ok=True); handler = RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=3, encoding="utf-8", delay=True); handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s")); logger.addHandler(handler)
+        except OSError: logger.addHandler(logging.NullHandler())
+    return logger
+
+class MyLogger:
+    def __init__(self, log_queue, level=lambda: logging.INFO): self.log_queue, self.level = log_queue, level
+    def debug(self, msg):
+        if msg.startswith('[debug] ') and self.level() <= logging.DEBUG: self.log_queue.put(f"DEBUG: {msg}\n")
+    def info(self, msg):_ = self.level() <= logging.INFO and self.log_queue.put(f"INFO: {msg}\n")
+    def warning(self, msg):_ = self.level() <= logging.WARNING and self.log_queue.put(f"WARNING: {msg}\n")
+    def error(self, msg): self.log_queue.put(f"ERROR: {msg}\n")
+
+class InfoCache:
+    def __init__(self, directory=INFO_CACHE_DIR, ttl=INFO_CACHE_TTL, max_bytes=INFO_CACHE_MAX_BYTES):
+        self.directory, self.ttl, self.max_bytes = directory, ttl, max_bytes; self.lock = threading.Lock()
+
+    @staticmethod
+    def key_for(url):
+        match = YOUTUBE_ID_RE.search(url)
+        return f"youtube:{match.group(1)}" if match else urlparse(url.strip())._replace(fragment="").geturl().rstrip("/")
+    def _path(self, url): return os.path.join(self.directory, hashlib.sha1(self.key_for(url).encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            with open(path, encoding="utf-8") as f: entry = json.load(f)
+            if time.time() - entry['fetched'] > self.ttl: os.remove(path); return None
+            os.utime(path); return entry['info']
+        except (OSError, ValueError, KeyError, TypeError): return None
+
+    def put(self, url, info):
+        path = self._path(url)
+        with self.lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(path + ".tmp", "w", encoding="utf-8") as f: json.dump({'fetched': time.time(), 'info': info}, f)
+                os.replace(path + ".tmp", path); self._evict()
+            except (OSError, TypeError, ValueError): pass
+
+    def _evict(self):
+        entries = sorted((e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(self.directory) if e.name.endswith(".json"))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes: break
+            try: os.remove(path); total -= size
+            except OSError: pass
+
+class ExtractorPool:
+    def __init__(self, max_idle=4): self.max_idle = max_idle; self.lock = threading.Lock(); self.key = None; self.idle = []
+
+    @contextmanager
+    def borrow(self, ydl_opts):
+        from yt_dlp import YoutubeDL
+        key = repr(sorted((k, v) for k, v in ydl_opts.items() if k != 'logger'))
+        with self.lock:
+            if key != self.key: self.key, stale, self.idle = key, self.idle, []; [ydl.close() for ydl in stale]
+            ydl = self.idle.pop() if self.idle else YoutubeDL(ydl_opts)
+        try: yield ydl
+        finally:
+            with self.lock:
+                if key == self.key and len(self.idle) < self.max_idle: self.idle.append(ydl)
+                else: ydl.close()
+
+class DownloadArchive:
+    def __init__(self, path=ARCHIVE_FILE): self.path = path; self.lock = threading.Lock(); self.db = None
+
+    @staticmethod
+    def key_for(url, info=None):
+        if info and info.get('id') and info.get('extractor_key'): return f"{info['extractor_key'].lower()}:{info['id']}"
+        if YOUTUBE_ID_RE.search(url): return InfoCache.key_for(url)
+        try: extractor = url_extractor(url); video_id = extractor and extractor.is_single_video(url) and extractor.get_temp_id(url)
+        except ImportError: video_id = None
+        return f"{extractor.ie_key().lower()}:{video_id}" if video_id else InfoCache.key_for(url)
+
+    def _connect(self):
+        if self.db is None:
+            import sqlite3
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True); self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL"); self.db.execute("CREATE TABLE IF NOT EXISTS downloads (video_key TEXT NOT NULL, format TEXT NOT NULL, filepath TEXT, completed REAL NOT NULL, PRIMARY KEY (video_key, format)) WITHOUT ROWID"); self.db.commit()
+        return self.db
+
+    def contains(self, url, format_id, info=None):
+        key = self.key_for(url, info)
+        with self.lock:
+            try:
+                db = self._connect(); row = db.execute("SELECT filepath FROM downloads WHERE video_key = ? AND format = ?", (key, format_id)).fetchone()
+                if row is None: return False
+                if row[0] and not os.path.exists(row[0]): db.execute("DELETE FROM downloads WHERE video_key = ? AND format = ?", (key, format_id)); db.commit(); return False
+                return True
+            except Exception: return False
+
+    def add(self, url, format_id, info=None, filepath=None):
+        with self.lock:
+            try: db = self._connect(); db.execute("INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?)", (self.key_for(url, info), format_id, filepath, time.time())); db.commit()
+            except Exception: pass
+
+class ProgressTracker:
+    def __init__(self, smoothing=SPEED_SMOOTHING): self.smoothing = smoothing; self.lock = threading.Lock(); self.latest = {}; self.stats = {}
+
+    def report(self, item, status, downloaded=0, total=None):
+        with self.lock: self.latest[item] = (status, downloaded, total, time.monotonic())
+
+    def forget(self, item):
+        with self.lock: self.latest.pop(item, None); self.stats.pop(item, None)
+
+    def drain(self):
+        with self.lock: latest, self.latest = self.latest, {}
+        updates = []
+        for item, (status, downloaded, total, stamp) in latest.items():
+            prev_downloaded, prev_stamp, speed = self.stats.get(item, (None, None, None))
+            if prev_stamp is not None and stamp > prev_stamp and downloaded >= prev_downloaded:
+                current = (downloaded - prev_downloaded) / (stamp - prev_stamp); speed = current if speed is None else speed + self.smoothing * (current - speed)
+            elif prev_stamp is None or downloaded < prev_downloaded: speed = None
+            self.stats[item] = (downloaded, stamp, speed)
+            percent = downloaded / total * 100 if total else None
+            eta = (total - downloaded) / speed if total and speed else None
+            updates.append((item, status, percent, speed, eta))
+        return updates
+
+class DownloadScheduler:
+    def __init__(self, worker, max_active=3, max_per_host=2, on_change=None):
+        self.worker, self.max_active, self.max_per_host, self.on_change = worker, max_active, max_per_host, on_change
+        self.lock = threading.RLock(); self.room = threading.Condition(self.lock); self.pending = []; self.active = {}
+
+    @staticmethod
+    def host_of(url): host = (urlparse(url).hostname or "").lower(); return host[4:] if host.startswith("www.") else host
+    def _changed(self):_ = self.on_change and self.on_change()
+    def wait_for_room(self, limit):
+        with self.room: self.room.wait_for(lambda: len(self.pending) < limit)
+
+    def set_limits(self, max_active, max_per_host):
+        with self.lock: self.max_active, self.max_per_host = max(1, int(max_active)), max(1, int(max_per_host))
+        self._pump()
+
+    def submit(self, item, priority=0):
+        with self.lock:
+            if item in self.pending or item in self.active: return
+            item.priority = priority; index = next((i for i, p in enumerate(self.pending) if p.priority < priority), len(self.pending)); self.pending.insert(index, item)
+        self._changed(); self._pump()
+
+    def remove(self, item):
+        with self.lock:
+            if item not in self.pending: return False
+            self.pending.remove(item); self.room.notify_all()
+        self._changed(); return True
+
+    def move(self, item, offset):
+        with self.lock:
+            if item not in self.pending: return False
+            i = self.pending.index(item); j = max(0, min(len(self.pending) - 1, i + offset))
+            if i == j: return False
+            self.pending.insert(j, self.pending.pop(i)); item.priority = self.pending[j + 1 if offset < 0 else j - 1].priority
+        self._changed(); return True
+
+    def snapshot(self):
+        with self.lock: return list(self.active) + list(self.pending)
+
+    def _pump(self):
+        started = []
+        with self.lock:
+            for item in list(self.pending):
+                if len(self.active) >= self.max_active: break
+                host = self.host_of(item.url)
+                if sum(1 for h in self.active.values() if h == host) >= self.max_per_host: continue
+                self.pending.remove(item); self.active[item] = host; started.append(item)
+            if started: self.room.notify_all()
+        for item in started: threading.Thread(target=self._run, args=(item,), daemon=True).start()
+        if started: self._changed()
+
+    def _run(self, item):
+        try: self.worker(item)
+        finally:
+            with self.lock: self.active.pop(item, None)
+            self._changed(); self._pump()
+
+class SegmentedDownload:
+    def __init__(self, url, path, opener=None, headers=None, connections=SEGMENT_CONNECTIONS, chunk_size=None, on_progress=None):
+        self.url, self.path, self.opener, self.headers, self.connections, self.chunk_size, self.on_progress = url, path, opener or self._urlopen, dict(headers or {}), max(1, connections), chunk_size, on_progress
+        self.part, self.map_path = path + ".part", path + ".segments.json"; self.lock = threading.Lock(); self.stop = threading.Event(); self.error = None; self.size = None; self.segments = []; self.active = set(); self.first_byte = None
+
+    @staticmethod
+    def _urlopen(url, headers):
+        import urllib.request
+        return urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=60)
+
+    @staticmethod
+    def _content_range(response):
+        match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range') or "")
+        return tuple(int(g) for g in match.groups()) if match and getattr(response, 'status', None) == 206 else None
+
+    def _open(self, start, end): return self.opener(self.url, dict(self.headers, Range=f"bytes={start}-{end}"))
+    def downloaded(self):
+        with self.lock: return sum(pos - start for start, end, pos in self.segments)
+
+    def run(self, resume=True):
+        resumed = resume and self._load()
+        if not resumed:
+            response = self._open(0, 0); content_range = self._content_range(response)
+            if not content_range or not content_range[2]:
+                if getattr(response, 'status', None) != 200: response.close(); response = self.opener(self.url, self.headers)
+                if getattr(response, 'status', None) != 200: response.close(); raise SegmentError(f"Unexpected HTTP status {getattr(response, 'status', None)} for {self.url}")
+                return self._single(response)
+            response.close(); self.size = content_range[2]; count = max(1, min(self.connections, self.size // MIN_SEGMENT_SIZE)); step = -(-self.size // count)
+            self.segments = [[start, min(start + step, self.size) - 1, start] for start in range(0, self.size, step)]
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.part, "wb") as f: f.truncate(self.size)
+            self._save()
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.connections)]; [t.start() for t in threads]; saved = time.monotonic()
+        try:
+            while any(t.is_alive() for t in threads):
+                time.sleep(SEGMENT_TICK); self._report()
+                if time.monotonic() - saved >= SEGMENT_SAVE_INTERVAL: self._save(); saved = time.monotonic()
+        finally: self.stop.set(); [t.join() for t in threads]; self._save()
+        if isinstance(self.error, SegmentError) and resumed: self._discard(); self.stop.clear(); self.error = None; return self.run(resume=False)
+        if self.error is not None: raise self.error
+        self._report(); os.replace(self.part, self.path); self._discard(map_only=True); return self.size
+
+    def _load(self):
+        try:
+            with open(self.map_path, encoding="utf-8") as f: state = json.load(f)
+            if os.path.getsize(self.part) != state['size']: return False
+            self.size, self.segments = state['size'], [list(segment) for segment in state['segments']]; return True
+        except (OSError, ValueError, KeyError, TypeError): return False
+
+    def _save(self):
+        if self.size is None: return
+        with self.lock: state = {'url': self.url, 'size': self.size, 'segments': [list(segment) for segment in self.segments]}
+        try:
+            with open(self.map_path + ".tmp", "w", encoding="utf-8") as f: json.dump(state, f)
+            os.replace(self.map_path + ".tmp", self.map_path)
+        except OSError: pass
+
+    def _discard(self, map_only=False):
+        for path in [self.map_path] if map_only else [self.map_path, self.part]:
+            try: os.remove(path)
+            except OSError: pass
+
+    def _report(self):_ = self.on_progress and self.on_progress(self.downloaded(), self.size)
+
+    def _single(self, response):
+        self.segments, downloaded = [], 0; total = int(response.headers.get('Content-Length') or 0) or None
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with response, open(self.part, "wb") as f:
+            while True:
+                data = response.read(SEGMENT_READ_SIZE)
+                if not data: break
+                f.write(data); downloaded += len(data); self.first_byte = self.first_byte or time.monotonic();_ = self.on_progress and self.on_progress(downloaded, total)
+        if total is not None and downloaded != total: raise SegmentError(f"The connection closed after {downloaded} of {total} bytes")
+        os.replace(self.part, self.path); self.size = downloaded; return downloaded
+
+    def _next_segment(self):
+        with self.lock:
+            segment = next((s for s in self.segments if s[2] <= s[1] and id(s) not in self.active), None)
+            if segment is None:
+                victim = max((s for s in self.segments if id(s) in self.active), key=lambda s: s[1] - s[2], default=None)
+                if victim is None or victim[1] - victim[2] + 1 < 2 * MIN_SEGMENT_SIZE: return None
+                middle = victim[2] + (victim[1] - victim[2] + 1) // 2; segment = [middle, victim[1], middle]; victim[1] = middle - 1; self.segments.insert(self.segments.index(victim) + 1, segment)
+            self.active.add(id(segment)); return segment
+
+    def _worker(self):
+        while not self.stop.is_set():
+            segment = self._next_segment()
+            if segment is None: return
+            try: self._fetch(segment)
+            except Exception as e:
+                with self.lock: self.error = self.error or e
+                self.stop.set(); return
+            finally:
+                with self.lock: self.active.discard(id(segment))
+
+    def _fetch(self, segment):
+        failures = 0
+        while not self.stop.is_set():
+            with self.lock: start, end = segment[2], segment[1]
+            if start > end: return
+            request_end = min(end, start + self.chunk_size - 1) if self.chunk_size else end; received = 0
+            try:
+                response = self._open(start, request_end); content_range = self._content_range(response)
+                if not content_range or content_range[0] != start: response.close(); raise SegmentError(f"Server did not honour the range request for bytes {start}-{request_end}")
+                if content_range[2] != self.size: response.close(); raise SegmentError("The file changed on the server since the download started")
+                with response, open(self.part, "r+b", buffering=0) as f:
+                    f.seek(start)
+                    while not self.stop.is_set():
+                        with self.lock: position, limit = segment[2], min(segment[1], request_end)
+                        if position > limit: break
+                        data = response.read(min(SEGMENT_READ_SIZE, limit - position + 1))
+                        if not data: break
+                        f.write(data); received += len(data); self.first_byte = self.first_byte or time.monotonic()
+                        with self.lock: segment[2] += len(data)
+            except SegmentError: raise
+            except Exception as e:
+                status = getattr(e, 'status', None) or getattr(e, 'code', None)
+                if isinstance(status, int) and 400 <= status < 500 or failures >= SEGMENT_RETRIES: raise
+                failures += 1; time.sleep(failures); continue
+            if received: failures = 0
+            else:
+                failures += 1
+                if failures > SEGMENT_RETRIES: raise SegmentError(f"The server stopped sending data at byte {start}")
+
+@functools.lru_cache(maxsize=None)
+def segmented_ydl_class():
+    from yt_dlp import YoutubeDL
+    from yt_dlp.networking import Request
+
+    class SegmentedYoutubeDL(YoutubeDL):
+        def dl(self, name, info, subtitle=False, test=False):
+            connections = self.params.get('caa_connections') or 1
+            if not (subtitle or test) and self.params.get('caa_on_dl'): self.params['caa_on_dl'](info)
+            if subtitle or test or name == '-' or connections < 2 or info.get('protocol') not in ('http', 'https') or not info.get('url'): return super().dl(name, info, subtitle, test)
+            if os.path.isfile(name) and (not self.params.get('overwrites', True) or self.params.get('continuedl', True) and not self.params.get('nopart', False)):
+                for hook in self._progress_hooks: hook({'status': 'finished', 'downloaded_bytes': os.path.getsize(name), 'total_bytes': os.path.getsize(name), 'filename': name, 'info_dict': info})
+                return True, False
+            def on_progress(downloaded, total):
+                for hook in self._progress_hooks: hook({'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': total, 'filename': name, 'info_dict': info, 'caa_first_byte': download.first_byte})
+            self.to_screen(f"[download] Destination: {name} ({connections} connections)")
+            download = SegmentedDownload(info['url'], name, lambda url, headers: self.urlopen(Request(url, headers=headers)), info.get('http_headers'), connections, (info.get('downloader_options') or {}).get('http_chunk_size'), on_progress)
+            try: size = download.run()
+            except SegmentError as e: self.report_warning(f"Segmented download failed ({e}), retrying with a single connection"); download._discard(); return super().dl(name, info, subtitle, test)
+            for hook in self._progress_hooks: hook({'status': 'finished', 'downloaded_bytes': size, 'total_bytes': size, 'filename': name, 'info_dict': info})
+            return True, True
+
+        def post_process(self, filename, info, files_to_move=None):
+            defer = self.params.get('caa_postprocess'); pending = [type(pp).__name__ for pp in info.get('__postprocessors') or []]
+            if not defer or not (pending or any(self._pps[stage] for stage in ('post_process', 'after_move'))): return super().post_process(filename, info, files_to_move)
+            info['filepath'] = filename; job = {'filename': filename, 'files_to_move': dict(files_to_move or {}), 'postprocessors': pending, 'params': {k: self.params[k] for k in POSTPROCESS_PARAMS if k in self.params}}
+            job['info'] = self.sanitize_info({k: v for k, v in info.items() if k != '__postprocessors'}); defer(job); return info
+    return SegmentedYoutubeDL
+
+@functools.lru_cache(maxsize=1024)
+def url_extractor(url):
+    from yt_dlp.extractor import gen_extractor_classes
+    return next((ie for ie in gen_extractor_classes() if ie.suitable(url)), None)
+
+def run_postprocess_job(job):
+    from yt_dlp import YoutubeDL, postprocessor
+    with YoutubeDL(dict(job['params'], quiet=True, no_warnings=True)) as ydl:
+        info = dict(job['info'], __postprocessors=[getattr(postprocessor, name)(ydl) for name in job['postprocessors']])
+        return ydl.post_process(job['filename'], info, job['files_to_move']).get('filepath')
+
+class DownloadItem:
+    def __init__(self, info, url, format_id, progress):
+        self.info, self.url, self.format_id, self.progress = info, url, format_id, progress
+        self.uid = None; self.state = "queued"; self.priority = 0; self.filepath = self.postprocess_job = None; self.downloaded, self.total, self.bytes_done = 0, None, 0; self.timings = {}
+
+    def mark(self, phase, stamp=None): self.timings.setdefault(phase, stamp or time.monotonic())
+    def metrics(self):
+        t = self.timings; span = lambda a, b: round(t[b] - t[a], 3) if a in t and b in t else None
+        return {'queue_wait': span('queued', 'started'), 'extraction': span('started', 'extracted'), 'first_byte': span('extracted', 'first_byte'), 'transfer': span('first_byte', 'transferred'), 'merge': span('transferred', 'done'), 'total': span('queued', 'done')}
+
+    def update_progress(self, d):
+        if self.state in ["pausing", "cancelled"]: raise CustomError("Download Interrupted")
+        if d['status'] == 'downloading' and d.get('downloaded_bytes'): self.mark('first_byte', d.get('caa_first_byte'))
+        if d['status'] == 'downloading': self.state = "downloading"; self.downloaded, self.total = d.get('downloaded_bytes') or 0, d.get('total_bytes') or d.get('total_bytes_estimate'); self.progress.report(self, 'downloading', self.downloaded, self.total)
+        elif d['status'] == 'finished': self.state = "finished"; self.timings['transferred'] = time.monotonic(); self.bytes_done += d.get('total_bytes') or d.get('downloaded_bytes') or 0; self.progress.report(self, 'finished')
+
+class DownloadMetrics:
+    PHASES = ('queue_wait', 'extraction', 'first_byte', 'transfer', 'merge', 'total')
+    def __init__(self): self.lock = threading.Lock(); self.downloads = dict.fromkeys(("started", "finished", "paused", "cancelled", "error", "skipped"), 0); self.bytes = 0; self.phases = {phase: [0, 0.0, 0.0] for phase in self.PHASES}
+
+    def count(self, status):
+        with self.lock: self.downloads[status] = self.downloads.get(status, 0) + 1
+
+    def observe(self, item):
+        with self.lock:
+            self.bytes += item.bytes_done
+            for phase, value in item.metrics().items():
+                if value is not None: stat = self.phases[phase]; stat[0] += 1; stat[1] += value; stat[2] = max(stat[2], value)
+
+    def snapshot(self, **gauges):
+        with self.lock: return {'downloads': dict(self.downloads), 'bytes': self.bytes, 'phases': {phase: {'count': n, 'sum': round(total, 3), 'avg': round(total / n, 3) if n else None, 'max': round(peak, 3)} for phase, (n, total, peak) in self.phases.items()}, **gauges}
+
+    def prometheus(self, **gauges):
+        data = self.snapshot(**gauges); lines = ["# TYPE caa_downloads_total counter"] + [f'caa_downloads_total{{status="{status}"}} {n}' for status, n in data['downloads'].items()]
+        lines += ["# TYPE caa_download_bytes_total counter", f"caa_download_bytes_total {data['bytes']}", "# TYPE caa_download_phase_seconds summary"]
+        for phase, stat in data['phases'].items(): lines += [f'caa_download_phase_seconds_sum{{phase="{phase}"}} {stat["sum"]}', f'caa_download_phase_seconds_count{{phase="{phase}"}} {stat["count"]}']
+        lines += ["# TYPE caa_download_phase_seconds_max gauge"] + [f'caa_download_phase_seconds_max{{phase="{phase}"}} {stat["max"]}' for phase, stat in data['phases'].items()]
+        for name, value in gauges.items(): lines += [f"# TYPE caa_{name} gauge", f"caa_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+class DownloadSettings:
+    def __init__(self, **overrides):
+        self.download_dir = DEFAULT_DOWNLOAD_DIR; self.socket_timeout = 60; self.force_ipv4 = False; self.proxy = None; self.cookie_file = None; self.cookies_from_browser = None; self.max_concurrent = 3; self.max_per_host = 2; self.connections = SEGMENT_CONNECTIONS; self.postprocess_workers = POSTPROCESS_WORKERS; self.skip_archived = True
+        for name, value in overrides.items(): setattr(self, name, value)
+
+class DownloadEngine:
+    def __init__(self, settings=None, log_queue=None, listener=None, queue_file=QUEUE_FILE, item_factory=DownloadItem, archive_file=ARCHIVE_FILE):
+        self.settings = settings or DownloadSettings(); self.log_queue = queue.Queue() if log_queue is None else log_queue; self.listener, self.queue_file, self.item_factory = listener, queue_file, item_factory
+        self.log_level = logging.INFO; self.file_log = create_file_logger(); self.info_cache = InfoCache(); self.extractors = ExtractorPool(); self.progress = ProgressTracker(); self.metrics = DownloadMetrics(); self.archive = DownloadArchive(archive_file) if archive_file else None; self.postprocessors = None; self.postprocessor_workers = None; self.postprocessors_lock = threading.Lock()
+        self.items = []; self.uids = itertools.count(1); self.queue_file_lock = threading.Lock(); self.queue_timer_lock = threading.Lock(); self.queue_timer = None; self.restoring = False
+        self.scheduler = DownloadScheduler(self.download, self.settings.max_concurrent, self.settings.max_per_host, on_change=self.save_queue)
+
+    def _notify(self, event, item, *args):_ = self.listener and self.listener(event, item, *args)
+    def apply_limits(self): self.scheduler.set_limits(self.settings.max_concurrent, self.settings.max_per_host)
+    def postprocess_pool(self):
+        workers = max(1, int(self.settings.postprocess_workers)); pool = self.postprocessors
+        if pool is not None and self.postprocessor_workers == workers: return pool
+        with self.postprocessors_lock:
+            if self.postprocessors is None or self.postprocessor_workers != workers:
+                if self.postprocessors is not None: self.postprocessors.shutdown(wait=False)
+                self.postprocessors, self.postprocessor_workers = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")), workers
+            return self.postprocessors
+
+    def is_archived(self, url, format_id, info=None): return bool(self.archive and self.settings.skip_archived and self.archive.contains(url, format_id, info))
+    def find(self, uid): return next((item for item in self.items if item.uid == uid), None)
+    def busy(self): return bool(self.scheduler.snapshot()) or any(item.state == "processing" for item in list(self.items))
+    def export_metrics(self, fmt="json"):
+        with self.scheduler.lock: gauges = {'active_downloads': len(self.scheduler.active), 'pending_downloads': len(self.scheduler.pending)}
+        return self.metrics.prometheus(**gauges) if fmt == "prometheus" else json.dumps(self.metrics.snapshot(**gauges), indent=2)
+
+    def ydl_opts(self):
+        settings = self.settings; ydl_opts = {'noplaylist': True, 'quiet': True, 'verbose': self.log_level <= logging.DEBUG, 'logger': MyLogger(self.log_queue, lambda: self.log_level), 'socket_timeout': settings.socket_timeout}
+        if settings.force_ipv4: ydl_opts['source_address'] = '0.0.0.0'
+        if settings.proxy: ydl_opts['proxy'] = settings.proxy
+        if settings.cookie_file: ydl_opts['cookiefile'] = settings.cookie_file
+        elif settings.cookies_from_browser: ydl_opts['cookies_from_browser'] = tuple(settings.cookies_from_browser)
+        return ydl_opts
+
+    def get_info(self, url):
+        info = self.info_cache.get(url)
+        if info is not None: self.log_queue.put(f"Using cached info for: {url}\n"); return info
+        with self.extractors.borrow(self.ydl_opts()) as ydl: info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        self.info_cache.put(url, info); return info
+
+    def _create(self, info, url, format_id): item = self.item_factory(info, url, format_id, self.progress); item.uid = next(self.uids); self.items.append(item); return item
+    def add(self, info, url, format_id, start=True, force=False, priority=0):
+        if not force and self.is_archived(url, format_id, info): self.metrics.count("skipped"); self.log_queue.put(f"Already downloaded, skipping: {url}\n"); return None
+        item = self._create(info, url, format_id); item.priority = priority; self._notify("added", item)
+        if start: self.start(item); _ = priority and self._sync_order()
+        return item
+
+    def start(self, item): item.state = "queued"; item.timings = {'queued': time.monotonic()}; self.scheduler.submit(item, item.priority)
+    def resume(self, item):
+        if item.state != "paused": return False
+        self.start(item); return True
+
+    def pause(self, item):
+        if item.state == "downloading": item.state = "pausing"; return True
+        if item.state == "queued" and self.scheduler.remove(item): self._paused(item); return True
+        return False
+
+    def remove(self, item):
+        item.state = "cancelled"; self.scheduler.remove(item)
+        if item in self.items: self.items.remove(item); self.progress.forget(item); self.save_queue(); self._notify("removed", item)
+
+    def move(self, item, offset):
+        if not self.scheduler.move(item, offset): return False
+        self._sync_order(); return True
+    def move_to_top(self, item): return self.move(item, -len(self.items))
+    def _sync_order(self):
+        listed = set(self.items); order = [i for i in self.scheduler.snapshot() if i in listed]; members = set(order)
+        for n, i in zip([n for n, i in enumerate(self.items) if i in members], order): self.items[n] = i
+
+    def _paused(self, item, save=True):
+        if item.state == "cancelled" or item not in self.items: return
+        self.progress.forget(item); item.state = "paused"; self.log_queue.put(f"Download paused for {item.url}\n")
+        if save: self.save_queue()
+        self._notify("paused", item)
+
+    def _failed(self, item, error):
+        if item.state == "cancelled" or item not in self.items: return
+        self.progress.forget(item); item.state = "error"; self.log_queue.put(f"--- DOWNLOAD FAILED FOR: {item.url} ---\nERROR: {error}\n"); self.save_queue(); self._notify("error", item, error)
+
+    def save_queue(self):
+        if self.queue_file is None or self.restoring: return
+        with self.queue_timer_lock:
+            if self.queue_timer is not None: return
+            self.queue_timer = threading.Timer(QUEUE_SAVE_DELAY, self.flush_queue); self.queue_timer.daemon = True; self.queue_timer.start()
+
+    def flush_queue(self):
+        with self.queue_timer_lock: timer, self.queue_timer = self.queue_timer, None
+        _ = timer and timer.cancel()
+        if self.queue_file is None or self.restoring: return
+        order = [i for i in self.scheduler.snapshot() if i.state not in ("cancelled", "finished", "error")]
+        entries = [{'url': i.url, 'format_id': i.format_id, 'priority': i.priority, 'state': "paused" if i.state in ("paused", "pausing") else "queued", 'info': {k: i.info.get(k) for k in PERSISTED_INFO_KEYS}} for i in order + [i for i in list(self.items) if i.state in ("paused", "processing") and i not in order]]
+        with self.queue_file_lock:
+            try:
+                os.makedirs(os.path.dirname(self.queue_file), exist_ok=True)
+                with open(self.queue_file + ".tmp", "w", encoding="utf-8") as f: json.dump(entries, f, ensure_ascii=False)
+                os.replace(self.queue_file + ".tmp", self.queue_file)
+            except OSError as e: self.log_queue.put(f"Could not save the download queue: {e}\n")
+
+    def restore_queue(self):
+        if self.queue_file is None: return 0
+        try:
+            with open(self.queue_file, encoding="utf-8") as f: entries = json.load(f)
+        except (OSError, ValueError): return 0
+        self.restoring = True
+        try:
+            for entry in entries:
+                item = self._create(entry['info'], entry['url'], entry['format_id']); item.priority = entry.get('priority', 0)
+                if entry.get('state') == "paused": self._paused(item, save=False)
+                else: self.start(item)
+        finally: self.restoring = False
+        if entries: self.log_queue.put(f"Restored {len(entries)} download(s) from the previous session.\n"); self.save_queue()
+        return len(entries)
+
+    def log_download(self, item, status, started, error=None):
+        item.mark('done'); self.metrics.count(status); _ = status == "finished" and self.metrics.observe(item)
+        record = {'event': "download", 'status': status, 'url': item.url, 'id': item.info.get('id'), 'title': item.info.get('title'), 'format': item.format_id, 'bytes': item.bytes_done, 'seconds': round(time.time() - started, 2), 'timings': item.metrics()}
+        if error is not None: record['error'] = str(error)
+        self.file_log.log(logging.ERROR if error is not None else logging.INFO, json.dumps(record, ensure_ascii=False))
+
+    def download(self, item):
+        if item.state != "queued": return
+        item.state = "downloading"; started = time.time(); item.mark('started'); self.metrics.count("started")
+        try:
+            from yt_dlp.utils import DownloadError
+            self.log_queue.put(f"--- Starting/Resuming download for: {item.url} ---\n")
+            ydl_opts = self.ydl_opts()
+            ydl_opts.update({'quiet': False, 'progress_hooks': [item.update_progress], 'format': item.format_id, 'outtmpl': os.path.join(self.settings.download_dir, '%(title)s.%(ext)s'), 'merge_output_format': 'mp4', 'caa_connections': self.settings.connections, 'caa_on_dl': lambda info: item.mark('extracted'), 'post_hooks': [lambda path: setattr(item, 'filepath', path)]})
+            if self.settings.postprocess_workers: ydl_opts['caa_postprocess'] = lambda job: setattr(item, 'postprocess_job', job)
+            item.postprocess_job = item.filepath = None; info = self.info_cache.get(item.url)
+            with segmented_ydl_class()(ydl_opts) as ydl:
+                if info is not None:
+                    try: ydl.process_ie_result(info, download=True)
+                    except DownloadError as e: info = None; self.log_queue.put(f"Cached info for {item.url} is no longer usable ({e}), extracting again.\n")
+                if info is None: ydl.download([item.url])
+            if item.postprocess_job: self._postprocess(item, started)
+            else: self._completed(item, started)
+        except CustomError: self.log_download(item, "cancelled" if item.state == "cancelled" else "paused", started); self._paused(item)
+        except Exception as e: self.log_download(item, "error", started, e); self._failed(item, e)
+
+    def _postprocess(self, item, started):
+        job, item.postprocess_job = item.postprocess_job, None; item.state = "processing"; self.log_queue.put(f"Post-processing queued for: {item.url}\n"); self._notify("processing", item)
+        self.postprocess_pool().submit(run_postprocess_job, job).add_done_callback(lambda future: self._postprocessed(item, started, future))
+
+    def _postprocessed(self, item, started, future):
+        try: item.filepath = future.result() or item.filepath
+        except Exception as e: self.log_download(item, "error", started, e); self._failed(item, e); return
+        self._completed(item, started)
+
+    def _completed(self, item, started):
+        if item.state == "cancelled" or item not in self.items: self.log_download(item, "cancelled", started); return
+        if not (item.filepath and os.path.exists(item.filepath)): error = f"The downloaded file is missing: {item.filepath}"; self.log_download(item, "error", started, error); self._failed(item, error); return
+        item.state = "finished"; self.log_download(item, "finished", started)
+        if self.archive: self.archive.add(item.url, item.format_id, item.info, item.filepath)
+        self.save_queue(); self._notify("finished", item)
+
+    def start_batch(self, sources, format_id, priority=0):
+        thread = threading.Thread(target=self._batch_task, args=(sources, format_id, priority), daemon=True); thread.start(); return thread
+
+    def _batch_task(self, sources, format_id, priority):
+        self.log_queue.put(f"--- Batch: reading {len(sources)} link(s) ---\n"); slots = threading.BoundedSemaphore(BATCH_WORKERS * 2); found = 0
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch") as pool:
+            for url in self.iter_entry_urls(sources): self.scheduler.wait_for_room(BATCH_LOOKAHEAD); slots.acquire(); found += 1; pool.submit(self._resolve_batch_entry, url, format_id, priority).add_done_callback(lambda f: slots.release())
+        self.log_queue.put(f"--- Batch: finished, {found} item(s) found ---\n")
+
+    def iter_entry_urls(self, sources):
+        from yt_dlp import YoutubeDL
+        with YoutubeDL(dict(self.ydl_opts(), noplaylist=False, extract_flat='in_playlist', lazy_playlist=True)) as ydl:
+            for source in sources: yield from self._iter_entries(ydl, source, 0)
+
+    def _iter_entries(self, ydl, url, depth):
+        extractor = url_extractor(url)
+        if extractor and extractor.is_single_video(url): yield url; return
+        try: info = ydl.extract_info(url, download=False, process=False)
+        except Exception as e: self.log_queue.put(f"ERROR: Could not read {url}: {e}\n"); return
+        if info.get('_type') == 'url' and depth < 2: yield from self._iter_entries(ydl, info['url'], depth + 1); return
+        if info.get('_type') not in ('playlist', 'multi_video'):
+            url = info.get('webpage_url') or url
+            try: self.info_cache.put(url, ydl.sanitize_info(ydl.process_ie_result(info, download=False)))
+            except Exception: pass
+            yield url; return
+        for entry in info.get('entries') or []:
+            if not entry: continue
+            if (entry.get('_type') == 'playlist' or entry.get('ie_key') == 'YoutubeTab') and depth < 2: yield from self._iter_entries(ydl, entry.get('url') or entry.get('webpage_url'), depth + 1)
+            elif entry.get('url') or entry.get('webpage_url'): yield entry.get('url') or entry.get('webpage_url')
+
+    def _resolve_batch_entry(self, url, format_id, priority=0):
+        if self.is_archived(url, format_id): self.metrics.count("skipped"); self.log_queue.put(f"Already downloaded, skipping: {url}\n"); return
+        try: info = self.get_info(url)
+        except Exception as e: self.log_queue.put(f"ERROR: Could not get info for {url}: {e}\n"); return
+        info = {k: info.get(k) for k in PERSISTED_INFO_KEYS}; info['original_url'] = url
+        self.add(info, url, format_id, priority=priority)
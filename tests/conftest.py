@@ -0,0 +1,10 @@
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+# Keep logs, caches and archives written through the module-level defaults out of the real home directory.
+HOME = tempfile.mkdtemp(prefix="caa-home-"); atexit.register(shutil.rmtree, HOME, ignore_errors=True)
+os.environ["HOME"] = os.environ["USERPROFILE"] = HOME
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,21 @@
+import os
+import time
+import caa_engine
+from caa_engine import InfoCache
+
+def test_youtube_links_share_one_entry(tmp_path):
+    cache = InfoCache(str(tmp_path)); cache.put("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10", {'id': "dQw4w9WgXcQ"})
+    assert cache.get("https://youtu.be/dQw4w9WgXcQ") == {'id': "dQw4w9WgXcQ"} and cache.get("https://youtu.be/aaaaaaaaaaa") is None
+
+def test_expired_entries_are_dropped(tmp_path, monkeypatch):
+    cache = InfoCache(str(tmp_path), ttl=60); cache.put("https://a.com/v", {'id': "v"}); now = time.time()
+    monkeypatch.setattr(caa_engine.time, "time", lambda: now + 30); assert cache.get("https://a.com/v") == {'id': "v"}
+    monkeypatch.setattr(caa_engine.time, "time", lambda: now + 61); assert cache.get("https://a.com/v") is None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".json")]
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = InfoCache(str(tmp_path)); padding = "x" * 1000
+    for n, name in enumerate(("a", "b", "c")): cache.put(f"https://a.com/{name}", {'id': name, 'pad': padding}); os.utime(cache._path(f"https://a.com/{name}"), (1000 + n, 1000 + n))
+    assert cache.get("https://a.com/a") is not None
+    cache.max_bytes = 3 * os.path.getsize(cache._path("https://a.com/a")) + 100; cache.put("https://a.com/d", {'id': "d", 'pad': padding})
+    assert [name for name in "abcd" if cache.get(f"https://a.com/{name}") is not None] == ["a", "c", "d"]
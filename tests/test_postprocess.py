@@ -0,0 +1,29 @@
+import os
+import shutil
+import subprocess
+import pytest
+from caa_bench import StandInServer
+from caa_engine import DownloadEngine, DownloadSettings, InfoCache
+
+pytestmark = pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg is not installed")
+
+def make_stream(path, source, codec):
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", source, "-c", codec, path], check=True)
+
+def test_interrupted_merge_is_redone_from_existing_streams(tmp_path):
+    make_stream(str(tmp_path / "clip.fv.mp4"), "testsrc=duration=1:size=64x64:rate=10", "mpeg4"); make_stream(str(tmp_path / "clip.fa.m4a"), "sine=duration=1", "aac")
+    jobs, events = [], []
+    class Engine(DownloadEngine):
+        def _postprocess(self, item, started): jobs.append(item.postprocess_job['postprocessors']); super()._postprocess(item, started)
+    with StandInServer(latency=0) as server:
+        url = server.url("/media/clip")
+        engine = Engine(DownloadSettings(download_dir=str(tmp_path), connections=4, postprocess_workers=1), queue_file=None, archive_file=None, listener=lambda event, item, *rest: events.append(event))
+        engine.info_cache = InfoCache(str(tmp_path / "cache")); engine.info_cache.put(url, {'id': "clip", 'title': "clip", 'extractor': "generic", 'extractor_key': "Generic", 'webpage_url': url, 'formats': [
+            {'format_id': "v", 'url': server.url("/media/clip.mp4"), 'ext': "mp4", 'protocol': "http", 'vcodec': "mp4v", 'acodec': "none"},
+            {'format_id': "a", 'url': server.url("/media/clip.m4a"), 'ext': "m4a", 'protocol': "http", 'vcodec': "none", 'acodec': "mp4a"}]})
+        item = engine.add({'title': "clip"}, url, "v+a", start=False); engine.download(item)
+        try: engine.postprocess_pool().shutdown(wait=True)
+        finally: engine.postprocessors = None
+    assert server.requests == 0 and jobs == [["FFmpegMergerPP"]] and events == ["added", "processing", "finished"]
+    assert item.state == "finished" and item.filepath == str(tmp_path / "clip.mp4") and os.path.getsize(item.filepath) > 0
+    assert not (tmp_path / "clip.fv.mp4").exists() and not (tmp_path / "clip.fa.m4a").exists()
@@ -0,0 +1,26 @@
+import pytest
+import caa_engine
+from caa_engine import ProgressTracker
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = [100.0]; monkeypatch.setattr(caa_engine.time, "monotonic", lambda: clock[0]); return clock
+
+def test_only_the_latest_report_per_item_is_drained(clock):
+    tracker = ProgressTracker(); item = object()
+    tracker.report(item, 'downloading', 100, 1000); tracker.report(item, 'downloading', 250, 1000)
+    assert tracker.drain() == [(item, 'downloading', 25.0, None, None)] and tracker.drain() == []
+
+def test_speed_is_smoothed(clock):
+    tracker = ProgressTracker(smoothing=0.5); item = object()
+    tracker.report(item, 'downloading', 0, 1000); tracker.drain()
+    clock[0] += 1; tracker.report(item, 'downloading', 100, 1000); (_, _, percent, speed, eta), = tracker.drain()
+    assert (percent, speed, eta) == (10.0, 100.0, 9.0)
+    clock[0] += 1; tracker.report(item, 'downloading', 400, 1000); (_, _, percent, speed, eta), = tracker.drain()
+    assert (percent, speed, eta) == (40.0, 200.0, 3.0)
+
+def test_restarted_download_resets_speed(clock):
+    tracker = ProgressTracker(); item = object()
+    tracker.report(item, 'downloading', 500, None); tracker.drain(); clock[0] += 1; tracker.report(item, 'downloading', 600, None); tracker.drain()
+    clock[0] += 1; tracker.report(item, 'downloading', 10, None); assert tracker.drain() == [(item, 'downloading', None, None, None)]
+    tracker.forget(item); assert item not in tracker.stats
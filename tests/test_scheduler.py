@@ -0,0 +1,69 @@
+import json
+import time
+import threading
+import pytest
+from caa_engine import DownloadScheduler, DownloadEngine, DownloadSettings
+
+class Item:
+    def __init__(self, url, priority=0): self.url, self.priority = url, priority
+
+class BlockingWorker:
+    def __init__(self): self.release = threading.Event(); self.started = []; self.lock = threading.Lock()
+    def __call__(self, item):
+        with self.lock: self.started.append(item)
+        self.release.wait(10)
+
+@pytest.fixture
+def worker():
+    worker = BlockingWorker(); yield worker; worker.release.set()
+
+def wait_idle(scheduler, timeout=5):
+    deadline = time.monotonic() + timeout
+    while scheduler.snapshot():
+        assert time.monotonic() < deadline, "scheduler did not drain"
+        time.sleep(0.01)
+
+def test_global_limit(worker):
+    scheduler = DownloadScheduler(worker, max_active=2, max_per_host=5)
+    for i in range(5): scheduler.submit(Item(f"https://site{i}.com/v"))
+    assert len(scheduler.active) == 2 and len(scheduler.pending) == 3
+    worker.release.set(); wait_idle(scheduler); assert len(worker.started) == 5
+
+def test_per_host_limit_skips_to_other_hosts(worker):
+    scheduler = DownloadScheduler(worker, max_active=3, max_per_host=2)
+    items = [Item("https://www.a.com/1"), Item("https://a.com/2"), Item("https://a.com/3"), Item("https://b.com/1")]
+    for item in items: scheduler.submit(item)
+    assert set(scheduler.active) == {items[0], items[1], items[3]} and scheduler.pending == [items[2]]
+
+def test_raising_limits_starts_pending_items(worker):
+    scheduler = DownloadScheduler(worker, max_active=1, max_per_host=1)
+    for i in range(3): scheduler.submit(Item(f"https://site{i}.com/v"))
+    scheduler.set_limits(3, 1); assert len(scheduler.active) == 3 and not scheduler.pending
+
+def test_priority_insertion(worker):
+    scheduler = DownloadScheduler(worker, max_active=1, max_per_host=1)
+    first, low, high, mid = Item("https://a.com/1"), Item("https://a.com/2"), Item("https://a.com/3"), Item("https://a.com/4")
+    scheduler.submit(first); scheduler.submit(low); scheduler.submit(high, 5); scheduler.submit(mid, 1)
+    assert list(scheduler.active) == [first] and scheduler.pending == [high, mid, low]
+
+def test_move(worker):
+    scheduler = DownloadScheduler(worker, max_active=1, max_per_host=1)
+    items = [Item(f"https://a.com/{i}") for i in range(4)]
+    for item in items: scheduler.submit(item)
+    assert scheduler.move(items[3], -10) and scheduler.pending == [items[3], items[1], items[2]]
+    assert scheduler.move(items[1], 1) and scheduler.pending == [items[3], items[2], items[1]]
+    assert not scheduler.move(items[1], 1) and not scheduler.move(items[0], -1)
+
+def test_pause_and_restore_through_queue_file(tmp_path, worker):
+    queue_file = str(tmp_path / "queue.json")
+    engine = DownloadEngine(DownloadSettings(max_concurrent=1, max_per_host=1), queue_file=queue_file, archive_file=None); engine.scheduler.worker = worker
+    running, paused, queued = [engine.add({'title': name}, f"https://a.com/{name}", "best") for name in ("running", "paused", "queued")]
+    engine.add({'title': "urgent"}, "https://a.com/urgent", "best", priority=3)
+    assert engine.pause(paused) and paused.state == "paused"
+    engine.flush_queue()
+    with open(queue_file, encoding="utf-8") as f: saved = json.load(f)
+    assert [(e['info']['title'], e['state'], e['priority']) for e in saved] == [("running", "queued", 0), ("urgent", "queued", 3), ("queued", "queued", 0), ("paused", "paused", 0)]
+    restored = DownloadEngine(DownloadSettings(max_concurrent=1, max_per_host=1), queue_file=queue_file, archive_file=None); restored.scheduler.worker = worker
+    assert restored.restore_queue() == 4
+    assert [(i.info['title'], i.state) for i in restored.scheduler.snapshot()] == [("running", "queued"), ("urgent", "queued"), ("queued", "queued")]
+    assert [i.info['title'] for i in restored.items if i.state == "paused"] == ["paused"]
@@ -0,0 +1,85 @@
+import os
+import json
+import hashlib
+import pytest
+from caa_bench import StandInServer, MiB
+from caa_engine import SegmentedDownload, SegmentError, segmented_ydl_class
+
+def md5(data): return hashlib.md5(data).hexdigest()
+def file_md5(path):
+    with open(path, "rb") as f: return md5(f.read())
+
+def first_byte(header): return int(header[len("bytes="):].split("-")[0])
+
+def recording_opener(ranges, strip_range=False):
+    def opener(url, headers):
+        ranges.append(headers.get('Range')); return SegmentedDownload._urlopen(url, {k: v for k, v in headers.items() if not (strip_range and k == 'Range')})
+    return opener
+
+@pytest.fixture
+def server():
+    with StandInServer(latency=0.01, rate=4 * MiB, media_size=8 * MiB) as server: yield server
+
+def test_download_matches_source(tmp_path):
+    path = str(tmp_path / "a.mp4")
+    with StandInServer(latency=0.01, media_size=4 * MiB) as server:
+        assert SegmentedDownload(server.url("/media/a.mp4"), path, connections=4).run() == 4 * MiB
+    assert file_md5(path) == md5(server.media) and server.requests == 5
+    assert sorted(os.listdir(tmp_path)) == ["a.mp4"]
+
+def test_resume_after_interrupt(server, tmp_path):
+    path = str(tmp_path / "a.mp4")
+    class Interrupted(Exception): pass
+    def stop_early(downloaded, total):
+        if downloaded > 2 * MiB: raise Interrupted()
+    with pytest.raises(Interrupted): SegmentedDownload(server.url("/media/a.mp4"), path, connections=4, on_progress=stop_early).run()
+    with open(path + ".segments.json", encoding="utf-8") as f: saved = json.load(f)['segments']
+    assert os.path.getsize(path + ".part") == 8 * MiB and any(pos > start for start, end, pos in saved)
+    ranges = []; SegmentedDownload(server.url("/media/a.mp4"), path, opener=recording_opener(ranges), connections=4).run()
+    assert file_md5(path) == md5(server.media) and sorted(os.listdir(tmp_path)) == ["a.mp4"]
+    assert ranges and not any(start <= first_byte(r) < pos for r in ranges for start, end, pos in saved)
+
+def test_idle_connection_steals_work(server, tmp_path):
+    path = str(tmp_path / "a.mp4"); half = 4 * MiB
+    with open(path + ".part", "wb") as f: f.write(server.media[:half]); f.truncate(8 * MiB)
+    with open(path + ".segments.json", "w", encoding="utf-8") as f: json.dump({'url': server.url("/media/a.mp4"), 'size': 8 * MiB, 'segments': [[0, half - 1, half], [half, 8 * MiB - 1, half]]}, f)
+    ranges = []; SegmentedDownload(server.url("/media/a.mp4"), path, opener=recording_opener(ranges), connections=2).run()
+    assert file_md5(path) == md5(server.media)
+    starts = sorted(first_byte(r) for r in ranges)
+    assert starts[0] == half and half + 2 * MiB in starts and len(ranges) == server.requests
+
+def test_server_without_range_support(server, tmp_path):
+    path = str(tmp_path / "a.mp4"); ranges = []
+    assert SegmentedDownload(server.url("/media/a.mp4"), path, opener=recording_opener(ranges, strip_range=True), connections=4).run() == 8 * MiB
+    assert file_md5(path) == md5(server.media) and ranges == ["bytes=0-0"] and server.requests == 1 and sorted(os.listdir(tmp_path)) == ["a.mp4"]
+
+def test_existing_file_is_not_downloaded_again(server, tmp_path):
+    path = str(tmp_path / "a.mp4"); hooks = []
+    with open(path, "wb") as f: f.write(server.media)
+    with segmented_ydl_class()({'quiet': True, 'caa_connections': 4, 'progress_hooks': [hooks.append]}) as ydl:
+        assert ydl.dl(path, {'url': server.url("/media/a.mp4"), 'protocol': 'http'}) == (True, False)
+    assert server.requests == 0 and hooks[-1]['status'] == 'finished' and hooks[-1]['total_bytes'] == 8 * MiB
+
+class StubResponse:
+    def __init__(self, status, body, headers):
+        self.status, self.body, self.headers = status, body, headers
+    def read(self, size): chunk, self.body = self.body[:size], self.body[size:]; return chunk
+    def close(self): pass
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+@pytest.mark.parametrize("probe_headers", [{'Content-Range': "bytes 0-0/*"}, {}])
+def test_unparseable_probe_is_not_saved_as_the_file(tmp_path, probe_headers):
+    path = str(tmp_path / "a.mp4"); body = os.urandom(3 * MiB); requests = []
+    def opener(url, headers):
+        requests.append(headers.get('Range'))
+        if 'Range' in headers: return StubResponse(206, body[:1], dict(probe_headers))
+        return StubResponse(200, body, {'Content-Length': str(len(body))})
+    assert SegmentedDownload("http://stub/a.mp4", path, opener=opener, connections=4).run() == len(body)
+    assert file_md5(path) == md5(body) and requests == ["bytes=0-0", None]
+
+def test_truncated_single_stream_fails(tmp_path):
+    path = str(tmp_path / "a.mp4")
+    opener = lambda url, headers: StubResponse(200, b"x" * MiB, {'Content-Length': str(2 * MiB)})
+    with pytest.raises(SegmentError): SegmentedDownload("http://stub/a.mp4", path, opener=opener, connections=4).run()
+    assert not os.path.exists(path)